@@ -1,10 +1,43 @@
 import streamlit as st
 import datetime
 import os
+import io
 import random
+import time
+import bisect
+import queue
+import atexit
+import threading
+import traceback
+import uuid
+import sys
+import weakref
+from collections import OrderedDict, deque
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from types import MappingProxyType
+import numpy as np
 import pandas as pd
 from PIL import Image, ImageDraw
 
+import reports
+from core import (
+    COSMETIC_KEYS, TURTLE_SIZE, WATER_RGBA, BADGE_RULES, BADGE_OPS, BADGE_RULES_BY_EVENT,
+    profile_suffix, data_file_name, profile_file_name, discover_profiles,
+    load_history, read_profile_file, write_log_rows, write_file_atomic, file_version,
+    mascot_state, compute_history_stats, compute_weekly_summary, compute_badges,
+    list_archives, read_archive_summaries, apply_retention, load_history_range, compute_alltime_stats,
+    render_turtle, water_line, draw_backdrop, draw_confetti, draw_turtle,
+)
+
+try:
+    # optional: native change notifications (inotify on Linux)
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
 # ===================== CONFIG / CONSTANTS =====================
 
 AGE_GUIDELINES = {
@@ -28,20 +61,62 @@ HYDRATION_TIPS = [
 XP_PER_ML_DIVISOR = 10
 XP_PER_LEVEL = 500
 
+# weight-based goal (ml per kg) and the kg range the what-if simulator sweeps
+ML_PER_KG = 35
+WHATIF_KG_RANGE = range(30, 151, 5)
+
+# history time-lapse: ms per day, and the page colour frames are flattened on
+TIMELAPSE_FRAME_MS = 120
+TIMELAPSE_PAGE_RGB = {False: (255, 255, 255), True: (14, 17, 23)}
+
+# quick-add taps are applied as one batch once no tap came for this long; the
+# timer that checks this only runs while taps are queued (seconds)
+DRINK_DEBOUNCE_S = 0.8
+
+# household dashboard: concurrent profile readers and render budget (seconds)
+HOUSEHOLD_MAX_READERS = 8
+HOUSEHOLD_BUDGET_S = 2.0
+
+# process-wide profile cache shared by all sessions (WATERBUDDY_CACHE_MB)
+PROFILE_CACHE_MAX_BYTES = int(os.environ.get("WATERBUDDY_CACHE_MB", "64")) * 1024 * 1024
+
+# write-behind persistence: how long shutdown and a profile load wait for
+# queued writes, and the pause before a failed write is retried (seconds)
+PERSIST_SHUTDOWN_TIMEOUT_S = 10.0
+PERSIST_LOAD_TIMEOUT_S = 2.0
+PERSIST_RETRY_S = 2.0
+
+# live cross-session sync: disk poll interval when watchdog is unavailable,
+# how often each session checks the in-memory change versions (seconds), and
+# how many changes per file the watcher remembers with their writer
+FILE_WATCH_POLL_S = 1.0
+SYNC_CHECK_S = 2.0
+FILE_WATCH_LOG_LEN = 64
+
+# background reports: render processes, finished reports kept, UI poll (seconds)
+REPORT_MAX_WORKERS = 2
+REPORT_CACHE_ENTRIES = 32
+REPORT_POLL_S = 1.0
+
+# intraday pattern model: days of data before adaptive reminders kick in,
+# and how far behind the usual curve (ml) counts as "behind"
+PATTERN_MIN_DAYS = 3
+PATTERN_BEHIND_ML = 250
+
+BADGES_PER_ROW = 5
+
 # ---------- file helpers (multi-profile) ----------
 
 def get_profile_suffix() -> str:
     if "profile_name" in st.session_state:
-        name = st.session_state.profile_name
-        return name.replace(" ", "_").lower()
+        return profile_suffix(st.session_state.profile_name)
     return "default"
 
-def get_data_file() -> str:
-    return f"water_log_{get_profile_suffix()}.txt"
-
-def get_profile_file() -> str:
-    return f"water_profile_{get_profile_suffix()}.txt"
+def get_data_file(suffix: str = None) -> str:
+    return data_file_name(suffix or get_profile_suffix())
 
+def get_profile_file(suffix: str = None) -> str:
+    return profile_file_name(suffix or get_profile_suffix())
 
 # ===================== STATE INIT / FILE I/O =====================
 
@@ -65,6 +140,16 @@ def init_state():
         s.data_loaded = False
     if "_ask_reset" not in s:
         s._ask_reset = False
+    if "drink_queue" not in s:
+        s.drink_queue = []
+    if "notices" not in s:
+        s.notices = []
+    if "session_uid" not in s:
+        s.session_uid = uuid.uuid4().hex
+    if "sync_seen" not in s:
+        s.sync_seen = {}
+    if "report_key" not in s:
+        s.report_key = None
 
     if "xp" not in s:
         s.xp = 0
@@ -74,7 +159,7 @@ def init_state():
         s.last_xp_gain = 0
 
     # cosmetics from XP shop
-    for key in ("has_bandana", "has_sunglasses", "has_crown", "has_party_shell"):
+    for key in COSMETIC_KEYS:
         if key not in s:
             s[key] = False
 
@@ -84,6 +169,28 @@ def init_state():
     if "last_drink_iso" not in s:
         s.last_drink_iso = None
 
+    # badge engine state (badges_unlocked is None until seeded from history)
+    if "badges_unlocked" not in s:
+        s.badges_unlocked = None
+    if "streak_days" not in s:
+        s.streak_days = 0
+    if "streak_date" not in s:
+        s.streak_date = None
+    if "month_key" not in s:
+        s.month_key = None
+    if "month_total_ml" not in s:
+        s.month_total_ml = 0
+
+    # intraday pattern: ml per hour-of-day over past days, plus today's hours
+    if "pattern_hist" not in s:
+        s.pattern_hist = [0] * 24
+    if "pattern_today" not in s:
+        s.pattern_today = [0] * 24
+    if "pattern_days" not in s:
+        s.pattern_days = 0
+    if "pattern_date" not in s:
+        s.pattern_date = None
+
     # quick-add custom presets
     if "quick1" not in s:
         s.quick1 = 100
@@ -119,97 +226,112 @@ def load_today_from_file():
 
 
 def save_today_to_file():
-    data_file = get_data_file()
     today = datetime.date.today().isoformat()
-    history = {}
-
-    if os.path.exists(data_file):
-        with open(data_file, "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                parts = line.split(",")
-                if len(parts) != 3:
-                    continue
-                d, t, g = parts
-                try:
-                    history[d] = (int(t), int(g))
-                except ValueError:
-                    continue
-
-    history[today] = (st.session_state.total_ml, st.session_state.goal_ml)
-
-    with open(data_file, "w", encoding="utf-8") as f:
-        for d, (t, g) in sorted(history.items()):
-            f.write(f"{d},{t},{g}\n")
+    get_persistence_worker().put_log_row(
+        get_data_file(), today, st.session_state.total_ml, st.session_state.goal_ml,
+        origin=st.session_state.session_uid,
+    )
 
 
-def load_history():
-    data_file = get_data_file()
-    history = {}
-    if not os.path.exists(data_file):
-        return history
-    with open(data_file, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            parts = line.split(",")
-            if len(parts) != 3:
-                continue
-            d, t, g = parts
-            try:
-                history[d] = (int(t), int(g))
-            except ValueError:
-                continue
-    return history
+def add_today_to_file(amount: int = 0):
+    """Queue amount ml and the current goal on top of today's total on file,
+    so drinks logged meanwhile by other sessions are kept."""
+    today = datetime.date.today().isoformat()
+    get_persistence_worker().put_log_add(
+        get_data_file(), today, amount, st.session_state.goal_ml,
+        origin=st.session_state.session_uid,
+    )
 
 
 def load_profile():
     profile_file = get_profile_file()
-    if not os.path.exists(profile_file):
-        return
     s = st.session_state
+    s.badges_unlocked = None
+    s.streak_days = 0
+    s.streak_date = None
+    s.month_key = None
+    s.month_total_ml = 0
+    s.pattern_hist = [0] * 24
+    s.pattern_today = [0] * 24
+    s.pattern_days = 0
+    s.pattern_date = None
     try:
-        with open(profile_file, "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if "=" not in line:
-                    continue
-                k, v = line.split("=", 1)
-                if k == "xp":
-                    s.xp = int(v)
-                elif k == "level":
-                    s.level = int(v)
-                elif k in ("has_bandana", "has_sunglasses", "has_crown", "has_party_shell"):
-                    s[k] = (v == "True")
-                elif k == "last_drink_iso":
-                    s.last_drink_iso = v if v else None
-                elif k == "quick1":
-                    s.quick1 = int(v)
-                elif k == "quick2":
-                    s.quick2 = int(v)
-                elif k == "quick3":
-                    s.quick3 = int(v)
+        for k, v in read_profile_file(profile_file).items():
+            if k == "xp":
+                s.xp = int(v)
+            elif k == "level":
+                s.level = int(v)
+            elif k in COSMETIC_KEYS:
+                s[k] = (v == "True")
+            elif k == "last_drink_iso":
+                s.last_drink_iso = v if v else None
+            elif k == "quick1":
+                s.quick1 = int(v)
+            elif k == "quick2":
+                s.quick2 = int(v)
+            elif k == "quick3":
+                s.quick3 = int(v)
+            elif k == "badges":
+                s.badges_unlocked = set(v.split("|")) if v else set()
+            elif k == "streak_days":
+                s.streak_days = int(v)
+            elif k == "streak_date":
+                s.streak_date = v if v else None
+            elif k == "month_key":
+                s.month_key = v if v else None
+            elif k == "month_total_ml":
+                s.month_total_ml = int(v)
+            elif k in ("pattern_hist", "pattern_today"):
+                hours = [int(x) for x in v.split(",")] if v else []
+                if len(hours) == 24:
+                    s[k] = hours
+            elif k == "pattern_days":
+                s.pattern_days = int(v)
+            elif k == "pattern_date":
+                s.pattern_date = v if v else None
     except Exception:
         pass
+    s.saved_profile = profile_content() if os.path.exists(profile_file) else None
+
+
+def profile_content() -> str:
+    s = st.session_state
+    lines = [
+        f"xp={s.xp}",
+        f"level={s.level}",
+        f"has_bandana={s.has_bandana}",
+        f"has_sunglasses={s.has_sunglasses}",
+        f"has_crown={s.has_crown}",
+        f"has_party_shell={s.has_party_shell}",
+        f"last_drink_iso={s.last_drink_iso or ''}",
+        f"quick1={s.quick1}",
+        f"quick2={s.quick2}",
+        f"quick3={s.quick3}",
+    ]
+    if s.badges_unlocked is not None:
+        lines.append(f"badges={'|'.join(sorted(s.badges_unlocked))}")
+    lines += [
+        f"streak_days={s.streak_days}",
+        f"streak_date={s.streak_date or ''}",
+        f"month_key={s.month_key or ''}",
+        f"month_total_ml={s.month_total_ml}",
+        f"pattern_hist={','.join(map(str, s.pattern_hist))}",
+        f"pattern_today={','.join(map(str, s.pattern_today))}",
+        f"pattern_days={s.pattern_days}",
+        f"pattern_date={s.pattern_date or ''}",
+    ]
+    return "".join(f"{line}\n" for line in lines)
 
 
 def save_profile():
     s = st.session_state
-    profile_file = get_profile_file()
-    with open(profile_file, "w", encoding="utf-8") as f:
-        f.write(f"xp={s.xp}\n")
-        f.write(f"level={s.level}\n")
-        f.write(f"has_bandana={s.has_bandana}\n")
-        f.write(f"has_sunglasses={s.has_sunglasses}\n")
-        f.write(f"has_crown={s.has_crown}\n")
-        f.write(f"has_party_shell={s.has_party_shell}\n")
-        f.write(f"last_drink_iso={s.last_drink_iso or ''}\n")
-        f.write(f"quick1={s.quick1}\n")
-        f.write(f"quick2={s.quick2}\n")
-        f.write(f"quick3={s.quick3}\n")
+    content = profile_content()
+    # most runs change nothing, and an unchanged profile needs no write
+    # (which would also hold back sync of this file from other sessions)
+    if content == s.get("saved_profile"):
+        return
+    s.saved_profile = content
+    get_persistence_worker().put_file(get_profile_file(), content, origin=s.session_uid)
 
 
 # ===================== CORE LOGIC =====================
@@ -218,11 +340,15 @@ def recalc_goal_from_age_or_weight():
     s = st.session_state
     if s.use_weight_goal:
         try:
-            s.goal_ml = int(s.weight_kg) * 35
+            s.goal_ml = int(s.weight_kg) * ML_PER_KG
         except Exception:
             s.goal_ml = AGE_GUIDELINES.get(s.age_group, 2000)
     else:
         s.goal_ml = AGE_GUIDELINES.get(s.age_group, s.goal_ml)
+    add_today_to_file()
+    # a lower goal can complete the day without another drink
+    close_day_if_met()
+    save_profile()
 
 
 def set_manual_goal(goal_str: str):
@@ -232,14 +358,17 @@ def set_manual_goal(goal_str: str):
         if val <= 0:
             raise ValueError
         st.session_state.goal_ml = val
-        save_today_to_file()
+        add_today_to_file()
+        close_day_if_met()
+        save_profile()
         st.success(f"Daily goal set to {val} ml")
     except ValueError:
         st.error("Enter a positive integer for goal (ml).")
 
 
-def add_xp_from_amount(amount: int):
-    gained = max(0, amount // XP_PER_ML_DIVISOR)
+def add_xp_from_amounts(amounts: list):
+    # XP is earned per drink, so a batch gains exactly what separate taps would
+    gained = sum(max(0, amount // XP_PER_ML_DIVISOR) for amount in amounts)
     st.session_state.last_xp_gain = gained
     if gained == 0:
         return
@@ -248,30 +377,227 @@ def add_xp_from_amount(amount: int):
     s.xp += gained
     old_level = s.level
     s.level = 1 + s.xp // XP_PER_LEVEL
-    save_profile()
     if s.level > old_level:
-        st.balloons()
-        st.success(f"Level up! You reached Level {s.level} 🎉")
+        notify("balloons")
+        notify("success", f"Level up! You reached Level {s.level} 🎉")
 
 
-def add_water(amount: int):
-    if amount <= 0:
+def add_water_batch(drinks: list):
+    """Apply (amount, datetime) drinks as one update with a single save."""
+    drinks = [(amount, when) for amount, when in drinks if amount > 0]
+    if not drinks:
         return
-    st.session_state.total_ml += amount
-    st.session_state.last_drink_iso = datetime.datetime.now().isoformat()
-    add_xp_from_amount(amount)
-    save_today_to_file()
+    s = st.session_state
+    for amount, when in drinks:
+        s.total_ml += amount
+        month = when.date().isoformat()[:7]
+        if s.month_key != month:
+            s.month_key = month
+            s.month_total_ml = 0
+        s.month_total_ml += amount
+        record_drink_pattern(when, amount)
+    s.last_drink_iso = max(when for _, when in drinks).isoformat()
+
+    add_xp_from_amounts([amount for amount, _ in drinks])
+    emit_badge_event("drink", {
+        "goal_ratio": s.total_ml / max(1, s.goal_ml),
+        "hour": min(when.hour for _, when in drinks),
+        "month_total_ml": s.month_total_ml,
+    })
+    close_day_if_met()
+    add_today_to_file(sum(amount for amount, _ in drinks))
     save_profile()
 
 
+def notify(kind: str, text: str = ""):
+    """Queue a UI message; show_notices renders it after all state updates."""
+    st.session_state.notices.append((kind, text))
+
+
+def show_notices():
+    # st.* calls are where a pending rerun interrupts the script, so they come
+    # only after every state change and save of this run
+    s = st.session_state
+    notices, s.notices = s.notices, []
+    for kind, text in notices:
+        if kind == "balloons":
+            st.balloons()
+        else:
+            st.success(text)
+
+
+def queue_drink(amount: int):
+    """Button callback: queue the tap; flush_drink_queue applies it."""
+    if amount > 0:
+        st.session_state.drink_queue.append((amount, datetime.datetime.now()))
+
+
+def queue_custom_drink():
+    queue_drink(int(st.session_state.custom_amount))
+
+
+def flush_drink_queue():
+    """Apply every queued tap as a single batch.
+
+    Taps only rerun the log_water_panel fragment; drink_queue_timer flushes
+    once they pause for DRINK_DEBOUNCE_S, and any full run flushes straight
+    away.
+    """
+    s = st.session_state
+    if not s.drink_queue:
+        return
+    drinks, s.drink_queue = s.drink_queue, []
+    add_water_batch(drinks)
+
+
 def reset_day():
-    st.session_state.total_ml = 0
-    st.session_state.last_xp_gain = 0
-    st.session_state.last_drink_iso = None
+    s = st.session_state
+    today = datetime.date.today()
+    if s.month_key == today.isoformat()[:7]:
+        s.month_total_ml = max(0, s.month_total_ml - s.total_ml)
+    if s.streak_date == today.isoformat():
+        # today no longer counts towards the streak
+        s.streak_days = max(0, s.streak_days - 1)
+        yesterday = today - datetime.timedelta(days=1)
+        s.streak_date = yesterday.isoformat() if s.streak_days else None
+    if s.pattern_date == today.isoformat():
+        s.pattern_today = [0] * 24
+    s.total_ml = 0
+    s.last_xp_gain = 0
+    s.last_drink_iso = None
     save_today_to_file()
     save_profile()
 
 
+# ===================== INTRADAY PATTERN MODEL =====================
+
+def roll_drink_pattern(today: str):
+    """Fold the previous day's hours into the histogram once the date changes."""
+    s = st.session_state
+    if s.pattern_date == today:
+        return
+    if any(s.pattern_today):
+        s.pattern_hist = [h + t for h, t in zip(s.pattern_hist, s.pattern_today)]
+        s.pattern_days += 1
+    s.pattern_today = [0] * 24
+    s.pattern_date = today
+
+
+def record_drink_pattern(now: datetime.datetime, amount: int):
+    roll_drink_pattern(now.date().isoformat())
+    st.session_state.pattern_today[now.hour] += amount
+
+
+def expected_intake(now: datetime.datetime):
+    """(usual ml by this time of day, usual ml for the whole day), or None."""
+    s = st.session_state
+    if s.pattern_days < PATTERN_MIN_DAYS:
+        return None
+    hist = s.pattern_hist
+    by_now = sum(hist[:now.hour]) + hist[now.hour] * now.minute / 60
+    return by_now / s.pattern_days, sum(hist) / s.pattern_days
+
+
+# ===================== GOAL WHAT-IF =====================
+
+def whatif_candidate_goals(extra=()) -> list:
+    goals = set(AGE_GUIDELINES.values())
+    goals.update(kg * ML_PER_KG for kg in WHATIF_KG_RANGE)
+    goals.update(g for g in extra if g > 0)
+    return sorted(goals)
+
+
+def simulate_goals(history, goals) -> pd.DataFrame:
+    """Completion rate and current streak of the whole history under each goal.
+
+    Matches compute_history_stats with every day's goal replaced by the
+    candidate, but evaluates all candidates in one (goals x days) pass.
+    """
+    dates = sorted(history)
+    goals = np.asarray(sorted(set(goals)), dtype=np.int64)
+    if not dates or goals.size == 0:
+        return pd.DataFrame({"goal_ml": goals, "completion_rate": 0.0, "streak": 0})
+
+    intake = np.fromiter((history[d][0] for d in dates), dtype=np.int64, count=len(dates))
+    ordinals = np.fromiter(
+        (datetime.date.fromisoformat(d).toordinal() for d in dates),
+        dtype=np.int64, count=len(dates),
+    )
+    met = intake[None, :] >= goals[:, None]
+    completion = met.mean(axis=1) * 100.0
+
+    # the streak counts back from the last logged day over consecutive dates only
+    gaps = np.flatnonzero(np.diff(ordinals) != 1)
+    tail_start = gaps[-1] + 1 if gaps.size else 0
+    streak = np.cumprod(met[:, tail_start:][:, ::-1], axis=1).sum(axis=1)
+
+    return pd.DataFrame({
+        "goal_ml": goals,
+        "completion_rate": completion,
+        "streak": streak.astype(np.int64),
+    })
+
+
+# ===================== BADGE ENGINE =====================
+
+def emit_badge_event(event: str, context: dict):
+    """Evaluate only the still-locked rules subscribed to this event."""
+    s = st.session_state
+    if s.badges_unlocked is None:
+        return []
+    unlocked = []
+    for rule in BADGE_RULES_BY_EVENT.get(event, ()):
+        if rule["name"] in s.badges_unlocked:
+            continue
+        metric = context.get(rule["metric"])
+        if metric is not None and BADGE_OPS[rule["op"]](metric, rule["value"]):
+            s.badges_unlocked.add(rule["name"])
+            unlocked.append(rule["name"])
+    if unlocked:
+        notify("success", f"Badge unlocked: {', '.join(unlocked)} 🏅")
+    return unlocked
+
+
+def close_day_if_met():
+    """Advance the running streak once today's goal is reached and fire day_close."""
+    s = st.session_state
+    today = datetime.date.today()
+    if s.total_ml < s.goal_ml or s.streak_date == today.isoformat():
+        return
+    yesterday = (today - datetime.timedelta(days=1)).isoformat()
+    s.streak_days = s.streak_days + 1 if s.streak_date == yesterday else 1
+    s.streak_date = today.isoformat()
+    emit_badge_event("day_close", {
+        "goal_ratio": s.total_ml / max(1, s.goal_ml),
+        "streak": s.streak_days,
+    })
+
+
+def seed_badges_from_history(history: dict):
+    """One-off backfill for profiles saved before badges were persisted."""
+    s = st.session_state
+    streak = compute_history_stats(history)[0]
+    badges = compute_badges(history, streak)
+    s.badges_unlocked = {name for name, (ok, _) in badges.items() if ok}
+
+    today = datetime.date.today()
+    s.month_key = today.isoformat()[:7]
+    s.month_total_ml = sum(
+        intake for d, (intake, _) in history.items() if d.startswith(s.month_key)
+    )
+    s.streak_days = streak
+    s.streak_date = max(history) if streak else None
+    save_profile()
+
+
+def badge_board():
+    unlocked = st.session_state.badges_unlocked or set()
+    return {
+        rule["name"]: (rule["name"] in unlocked, rule["desc"])
+        for rule in BADGE_RULES
+    }
+
+
 def compute_progress():
     goal = max(1, st.session_state.goal_ml)
     total = st.session_state.total_ml
@@ -295,217 +621,927 @@ def motivational_message(percent: float) -> str:
         return "Wow, you crossed your goal! Stay balanced."
 
 
-def mascot_state(percent: float):
-    if percent < 50:
-        return "Neutral"
-    elif percent < 75:
-        return "Happy"
-    elif percent < 100:
-        return "Wave"
-    else:
-        return "Celebrate"
+# ===================== SHARED PROFILE CACHE =====================
 
+def history_nbytes(history) -> int:
+    """Approximate deep size of a {date: (total, goal)} mapping."""
+    size = sys.getsizeof(history)
+    for d, row in history.items():
+        size += sys.getsizeof(d) + sys.getsizeof(row) + sum(map(sys.getsizeof, row))
+    return size
 
-def compute_history_stats(history: dict):
-    if not history:
-        return 0, None, 0, 0.0, 0, 0.0
 
-    dates = sorted(history.keys())
-    total_days = len(dates)
+def history_frame(history) -> pd.DataFrame:
+    dates = sorted(history)
+    return pd.DataFrame({
+        "date": pd.to_datetime(pd.Series(dates, dtype="object")),
+        "intake_ml": pd.Series([history[d][0] for d in dates], dtype="int32"),
+        "goal_ml": pd.Series([history[d][1] for d in dates], dtype="int32"),
+    })
 
-    completed = 0
-    total_litres = 0.0
-    best_intake = 0
-    best_date = None
 
-    for d in dates:
-        intake, goal = history[d]
-        if intake >= goal:
-            completed += 1
-        if intake > best_intake:
-            best_intake = intake
-            best_date = d
-        total_litres += intake / 1000.0
-
-    completion_rate = completed / total_days * 100.0
-
-    streak = 0
-    last_date = datetime.date.fromisoformat(dates[-1])
-    current = last_date
-    date_set = set(dates)
-
-    while True:
-        d_str = current.isoformat()
-        if d_str not in date_set:
-            break
-        intake, goal = history[d_str]
-        if intake < goal:
-            break
-        streak += 1
-        current = current - datetime.timedelta(days=1)
-
-    return streak, best_date, best_intake, completion_rate, total_days, total_litres
-
-
-def compute_weekly_summary(history: dict):
-    if not history:
-        return 0, 0, 0, 0.0
-    today = datetime.date.today()
-    total_intake = 0
-    days_count = 0
-    days_goal_met = 0
-    for i in range(7):
-        d = (today - datetime.timedelta(days=i)).isoformat()
-        if d in history:
-            intake, goal = history[d]
-            days_count += 1
-            total_intake += intake
-            if intake >= goal:
-                days_goal_met += 1
-    if days_count == 0:
-        return 0, 0, 0, 0.0
-    avg_intake = total_intake / days_count
-    return days_count, total_intake, days_goal_met, avg_intake
-
-
-def compute_badges(history: dict, streak: int):
-    badges = {}
-    first_complete = any(intake >= goal for intake, goal in history.values())
-    double_goal = any(intake >= 2 * goal for intake, goal in history.values())
-    badges["First Day Complete"] = (first_complete, "Finish goal on any day.")
-    badges["3-Day Streak"] = (streak >= 3, "Hit your goal 3 days in a row.")
-    badges["7-Day Streak"] = (streak >= 7, "Hit your goal 7 days in a row.")
-    badges["Double Goal Day"] = (double_goal, "Drink at least 2× your goal in a day.")
-    return badges
+class HistorySnapshot:
+    """Immutable view of one profile's history and aggregates.
+
+    Snapshots are shared between sessions, so neither the history mapping nor
+    the DataFrame returned by frame() may be modified by callers.
+    """
+
+    def __init__(self, data_file: str, version, history: dict, segments=None):
+        self.data_file = data_file
+        self.version = version
+        self.history = MappingProxyType(history)
+        self.segments = tuple(list_archives(data_file) if segments is None else segments)
+        self.archives = tuple(read_archive_summaries(data_file, self.segments))
+        self.stats = compute_alltime_stats(history, self.archives)
+        self._history_bytes = history_nbytes(history)
+        self._frame = None
+        self._frame_bytes = 0
+        self._index = None
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        """History plus the lazily built frame and index, as they exist now."""
+        index = self._index
+        return self._history_bytes + self._frame_bytes + (index.nbytes if index else 0)
+
+    def frame(self) -> pd.DataFrame:
+        with self._lock:
+            if self._frame is None:
+                self._frame = history_frame(self.history)
+                self._frame_bytes = int(self._frame.memory_usage(deep=True).sum())
+            return self._frame
+
+    def index(self) -> "HistoryIndex":
+        with self._lock:
+            if self._index is None:
+                self._index = HistoryIndex(self.history)
+            return self._index
+
+    def first_date(self):
+        if self.archives:
+            return self.archives[0]["first_date"]
+        return min(self.history) if self.history else None
+
+    def history_range(self, start: str = None, end: str = None) -> dict:
+        """Day-level rows in [start, end]; archives are read only if reached."""
+        hot_start = min(self.history) if self.history else None
+        if not self.archives or (start and hot_start and start >= hot_start):
+            return {
+                d: row for d, row in self.history.items()
+                if (not start or d >= start) and (not end or d <= end)
+            }
+        return load_history_range(self.data_file, start, end, hot=dict(self.history),
+                                  segments=self.segments)
+
+
+class HistoryIndex:
+    """Sorted columns of a history for paging, sorting and date filtering.
+
+    Dates are kept sorted, so a date filter is two bisects; other sort keys
+    use a lazily built argsort. Only the requested page becomes a DataFrame.
+    """
+
+    COLUMNS = ("date", "intake_ml", "goal_ml")
+
+    def __init__(self, history):
+        self.dates = sorted(history)
+        self.intake = np.fromiter((history[d][0] for d in self.dates), dtype=np.int32,
+                                  count=len(self.dates))
+        self.goal = np.fromiter((history[d][1] for d in self.dates), dtype=np.int32,
+                                count=len(self.dates))
+        self._orders = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    @property
+    def nbytes(self) -> int:
+        # the date strings are shared with the snapshot's history keys
+        orders = list(self._orders.values())
+        return (sys.getsizeof(self.dates) + self.intake.nbytes + self.goal.nbytes
+                + sum(order.nbytes for order in orders))
+
+    def date_bounds(self, start: str = None, end: str = None):
+        lo = bisect.bisect_left(self.dates, start) if start else 0
+        hi = bisect.bisect_right(self.dates, end) if end else len(self.dates)
+        return lo, hi
+
+    def order(self, column: str) -> np.ndarray:
+        with self._lock:
+            if column not in self._orders:
+                values = self.intake if column == "intake_ml" else self.goal
+                # stable, so ties stay in date order
+                self._orders[column] = np.argsort(values, kind="stable")
+            return self._orders[column]
+
+    def page(self, start: str = None, end: str = None, sort: str = "date",
+             descending: bool = True, offset: int = 0, limit: int = 25):
+        """(page DataFrame, number of rows matching the date filter)."""
+        lo, hi = self.date_bounds(start, end)
+        count = max(0, hi - lo)
+        if sort == "date":
+            if descending:
+                first = hi - 1 - offset
+                rows = np.arange(first, max(lo, first - limit + 1) - 1, -1)
+            else:
+                rows = np.arange(lo + offset, min(hi, lo + offset + limit))
+        else:
+            rows = self.order(sort)
+            if lo > 0 or hi < len(self.dates):
+                rows = rows[(rows >= lo) & (rows < hi)]
+            if descending:
+                rows = rows[::-1]
+            rows = rows[offset:offset + limit]
+
+        page = pd.DataFrame({
+            "date": pd.to_datetime(pd.Series([self.dates[i] for i in rows], dtype="object")),
+            "intake_ml": self.intake[rows],
+            "goal_ml": self.goal[rows],
+        })
+        return page, count
+
+
+class ProfileCache:
+    """Reference-counted LRU cache of HistorySnapshots with a memory ceiling.
+
+    Sessions hold a CacheLease on the profile they have open; only unreferenced
+    entries are evicted when the cache grows past max_bytes. Snapshot sizes
+    include frames and indexes built after insertion, so the total is
+    re-measured whenever eviction is considered.
+
+    Each profile's archive segment list is looked up once and kept across
+    snapshot rebuilds; only retention changes it (invalidate(segments=True)).
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._refs = {}
+        self._segments = {}
+
+    def get(self, data_file: str) -> HistorySnapshot:
+        version = file_version(data_file)
+        with self._lock:
+            snap = self._entries.get(data_file)
+            if snap is not None and snap.version == version:
+                self._entries.move_to_end(data_file)
+                self._evict_locked(keep=data_file)
+                return snap
+            segments = self._segments.get(data_file)
+        if segments is None:
+            segments = list_archives(data_file)
+            with self._lock:
+                self._segments[data_file] = segments
+        # parse outside the lock; the version was taken first, so a concurrent
+        # write only makes this snapshot look older than it is
+        snap = HistorySnapshot(data_file, version, load_history(data_file), segments)
+        with self._lock:
+            self._entries.pop(data_file, None)
+            self._entries[data_file] = snap
+            self._evict_locked(keep=data_file)
+        return snap
+
+    def lease(self, data_file: str) -> "CacheLease":
+        return CacheLease(self, data_file)
+
+    def acquire(self, data_file: str):
+        with self._lock:
+            self._refs[data_file] = self._refs.get(data_file, 0) + 1
+
+    def release(self, data_file: str):
+        with self._lock:
+            count = self._refs.get(data_file, 0) - 1
+            if count > 0:
+                self._refs[data_file] = count
+            else:
+                self._refs.pop(data_file, None)
+            self._evict_locked()
+
+    def invalidate(self, data_file: str, segments: bool = False):
+        with self._lock:
+            self._entries.pop(data_file, None)
+            if segments:
+                self._segments.pop(data_file, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes_locked(),
+                    "max_bytes": self.max_bytes, "sessions": sum(self._refs.values())}
+
+    def _bytes_locked(self) -> int:
+        return sum(snap.nbytes for snap in self._entries.values())
+
+    def _evict_locked(self, keep: str = None):
+        total = self._bytes_locked()
+        for key in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            if key != keep and self._refs.get(key, 0) == 0:
+                total -= self._entries.pop(key).nbytes
+
+
+class CacheLease:
+    """A session's reference on one cache entry.
+
+    Kept in session state; the reference is dropped on release() or, for
+    sessions that simply go away, when Streamlit discards their state and the
+    lease is garbage collected.
+    """
+
+    def __init__(self, cache: ProfileCache, data_file: str):
+        self.data_file = data_file
+        cache.acquire(data_file)
+        self._finalizer = weakref.finalize(self, cache.release, data_file)
+
+    def release(self):
+        self._finalizer()
+
+
+@st.cache_resource
+def get_profile_cache() -> ProfileCache:
+    return ProfileCache(PROFILE_CACHE_MAX_BYTES)
+
+
+# ===================== WRITE-BEHIND PERSISTENCE =====================
+
+class PersistenceWorker:
+    """Background thread that writes profile data off the rerun path.
+
+    The UI enqueues writes and returns immediately. The worker drains the
+    queue in batches, merging log rows per data file and keeping only the last
+    content per profile file, so writes land in order with one rewrite per
+    file per batch. Drinks are queued as increments, so sessions logging the
+    same day concurrently add up instead of overwriting each other. Every enqueue gets a sequence number; last_persisted is the
+    highest one that has reached disk together with everything before it.
+
+    A failed log or profile write is kept and retried with the next batch (at
+    the latest after PERSIST_RETRY_S) and holds last_persisted back until it
+    lands. A failed retention pass is only reported; the next profile load
+    runs it again.
+    """
+
+    def __init__(self, cache: ProfileCache = None, watcher: "FileWatchService" = None):
+        self.cache = cache
+        self.watcher = watcher
+        self.last_error = None
+        self._queue = queue.Queue()
+        self._cond = threading.Condition()
+        self._enqueued = 0
+        self._persisted = 0
+        self._pending_writes = {}
+        self._failed_paths = set()
+        self._written = {}
+        self._retained = {}
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.drain, PERSIST_SHUTDOWN_TIMEOUT_S)
+
+    @property
+    def last_persisted(self) -> int:
+        with self._cond:
+            return self._persisted
+
+    @property
+    def pending(self) -> int:
+        with self._cond:
+            return self._enqueued - self._persisted
+
+    def has_pending(self, path: str, origin: str = None) -> bool:
+        """Whether a log or profile write for path is queued or being retried,
+        by origin if given and by anyone otherwise."""
+        with self._cond:
+            return any(p == path and origin in (None, o) for p, o in self._pending_writes)
+
+    def failing(self, path: str) -> bool:
+        with self._cond:
+            return path in self._failed_paths
+
+    def put_log_row(self, data_file: str, day: str, total: int, goal: int,
+                    origin: str = None) -> int:
+        return self._put(("log", data_file, (day, total, 0, goal), origin))
+
+    def put_log_add(self, data_file: str, day: str, amount: int, goal: int,
+                    origin: str = None) -> int:
+        """Add amount to whatever total the day has on disk when this lands."""
+        return self._put(("log", data_file, (day, None, amount, goal), origin))
+
+    def put_file(self, path: str, content: str, origin: str = None) -> int:
+        return self._put(("file", path, content, origin))
+
+    def put_retention(self, data_file: str, today: str, origin: str = None) -> int:
+        return self._put(("retention", data_file, today, origin))
+
+    def flush(self, timeout: float = None, paths=None) -> bool:
+        """Block until everything enqueued so far is on disk.
+
+        With paths, wait only for the log and profile writes queued for those
+        files. Returns False on timeout or as soon as one of the awaited
+        writes has failed.
+        """
+        with self._cond:
+            if paths is None:
+                target = self._enqueued
+                done = lambda: self._persisted >= target
+                failed = lambda: bool(self._failed_paths)
+            else:
+                done = lambda: not any(p in paths for p, _ in self._pending_writes)
+                failed = lambda: any(p in self._failed_paths for p in paths)
+            self._cond.wait_for(lambda: done() or failed(), timeout)
+            return done()
+
+    def drain(self, timeout: float = None) -> bool:
+        """Block until every queued log and profile write has landed, except
+        those to files that are currently failing (used at shutdown, so one
+        bad file does not cost the writes to healthy ones)."""
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: all(path in self._failed_paths for path, _ in self._pending_writes),
+                timeout,
+            )
+
+    def _put(self, op) -> int:
+        with self._cond:
+            self._enqueued += 1
+            seq = self._enqueued
+            if op[0] != "retention":
+                key = (op[1], op[3])
+                self._pending_writes[key] = self._pending_writes.get(key, 0) + 1
+            self._queue.put((seq, op))
+        return seq
+
+    def _run(self):
+        retry = []
+        dequeued = 0
+        while True:
+            batch = list(retry)
+            try:
+                batch.append(self._queue.get(timeout=PERSIST_RETRY_S if retry else None))
+            except queue.Empty:
+                pass
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            dequeued = max(dequeued, batch[-1][0])
+            failed = self._write_batch([op for _, op in batch])
+            retry = [(seq, op) for seq, op in batch if op[1] in failed and op[0] != "retention"]
+            with self._cond:
+                # retried ops are the oldest in the batch and hold the watermark
+                self._persisted = retry[0][0] - 1 if retry else dequeued
+                for _, op in batch:
+                    if op[0] != "retention" and op[1] not in failed:
+                        key = (op[1], op[3])
+                        self._pending_writes[key] -= 1
+                        if not self._pending_writes[key]:
+                            del self._pending_writes[key]
+                self._failed_paths = failed
+                self._cond.notify_all()
+
+    def _write_batch(self, ops: list) -> set:
+        """Write one batch; returns the paths whose write failed."""
+        log_rows = {}
+        log_origins = {}
+        files = {}
+        retention = {}
+        for kind, path, payload, origin in ops:
+            if kind == "log":
+                day, total, added, goal = payload
+                rows = log_rows.setdefault(path, {})
+                if total is None and day in rows:
+                    # an increment stacks on the day's earlier update
+                    total, earlier, _ = rows[day]
+                    added += earlier
+                rows[day] = (total, added, goal)
+                log_origins.setdefault(path, set()).add(origin)
+            elif kind == "retention":
+                retention[path] = (payload, origin)
+            else:
+                # the last content replaces earlier ones and holds only its writer's
+                files[path] = (payload, origin)
+
+        written = set()
+        archived = set()
+        failed = set()
+        for data_file, rows in log_rows.items():
+            try:
+                write_log_rows(data_file, rows,
+                               self._before_replace(data_file, log_origins[data_file]))
+                written.add(data_file)
+            except Exception as e:
+                self._report(data_file, e)
+                failed.add(data_file)
+        for data_file, (today, origin) in retention.items():
+            # once per file and day is enough; years only close at midnight
+            if data_file in failed or self._retained.get(data_file) == today:
+                continue
+            try:
+                if apply_retention(data_file, datetime.date.fromisoformat(today),
+                                   self._before_replace(data_file, {origin})):
+                    written.add(data_file)
+                    archived.add(data_file)
+                self._retained[data_file] = today
+            except Exception as e:
+                self._report(data_file, e)
+        for path, (content, origin) in files.items():
+            if self._written.get(path) == content and os.path.exists(path):
+                continue
+            try:
+                write_file_atomic(path, content, self._before_replace(path, {origin}))
+                self._written[path] = content
+                written.add(path)
+            except Exception as e:
+                self._report(path, e)
+                failed.add(path)
+
+        if self.cache is not None:
+            for path in written:
+                self.cache.invalidate(path, segments=path in archived)
+        return failed
+
+    def _before_replace(self, path: str, origins: set):
+        # tell the watcher whose writes this version holds before the rename,
+        # so the change event it triggers is never taken for a foreign write
+        if self.watcher is None:
+            return None
+        return lambda version: self.watcher.expect_write(path, version, origins)
+
+    def _report(self, path: str, error: Exception):
+        self.last_error = error
+        # print once per failing streak, not on every retry
+        if path not in self._failed_paths:
+            traceback.print_exception(type(error), error, error.__traceback__)
+
+
+@st.cache_resource
+def get_persistence_worker() -> PersistenceWorker:
+    return PersistenceWorker(get_profile_cache(), get_file_watch())
+
+
+# ===================== LIVE CROSS-SESSION SYNC =====================
+
+class FileWatchService:
+    """One watcher per server process for the profile files sessions have open.
+
+    Every change bumps an in-memory version per path and is logged with the
+    sessions whose writes it holds (None for changes from outside this
+    process), so a session can tell whether anyone else wrote since the
+    version it last saw.
+    Sessions compare these versions instead of polling the disk themselves.
+    Uses watchdog when installed and a single stat-polling thread otherwise.
+    """
+
+    def __init__(self, poll_s: float = FILE_WATCH_POLL_S):
+        self.poll_s = poll_s
+        self._lock = threading.Lock()
+        self._known = {}
+        self._versions = {}
+        self._log = {}
+        self._dirs = set()
+        self._observer = None
+        if Observer is not None:
+            self._observer = Observer()
+            self._observer.daemon = True
+            self._observer.start()
+        else:
+            threading.Thread(target=self._poll, name="file-watch", daemon=True).start()
+
+    def watch(self, path: str):
+        path = os.path.abspath(path)
+        with self._lock:
+            if path in self._known:
+                return
+            self._known[path] = file_version(path)
+            self._versions.setdefault(path, 0)
+            self._log.setdefault(path, deque(maxlen=FILE_WATCH_LOG_LEN))
+            directory = os.path.dirname(path)
+            if self._observer is not None and directory not in self._dirs:
+                self._dirs.add(directory)
+                self._observer.schedule(_WatchHandler(self), directory, recursive=False)
+
+    def version(self, path: str) -> int:
+        with self._lock:
+            return self._versions.get(os.path.abspath(path), 0)
+
+    def changes(self, paths, seen: dict, session_uid: str) -> list:
+        """Paths changed by someone else since `seen`; updates `seen` in place."""
+        changed = []
+        with self._lock:
+            for path in paths:
+                key = os.path.abspath(path)
+                version = self._versions.get(key, 0)
+                since = seen.get(path, version)
+                if since != version:
+                    log = self._log.get(key, ())
+                    # changes that fell out of the log are treated as foreign
+                    missed = not log or log[0][0] > since + 1
+                    if missed or any(v > since and origins - {session_uid}
+                                     for v, origins in log):
+                        changed.append(path)
+                seen[path] = version
+        return changed
+
+    def expect_write(self, path: str, version, origins=(None,)):
+        """Record an in-process write holding writes from origins before it
+        replaces path, so the change event it triggers is not reported again
+        as a foreign one."""
+        self._bump(os.path.abspath(path), frozenset(origins), version)
+
+    def check(self, path: str):
+        key = os.path.abspath(path)
+        current = file_version(key)
+        with self._lock:
+            if key not in self._known or self._known[key] == current:
+                return
+        self._bump(key, frozenset((None,)), current)
+
+    def _bump(self, key: str, origins: frozenset, current):
+        with self._lock:
+            if key not in self._known:
+                return
+            self._known[key] = current
+            self._versions[key] = self._versions.get(key, 0) + 1
+            self._log[key].append((self._versions[key], origins))
+
+    def _poll(self):
+        while True:
+            time.sleep(self.poll_s)
+            with self._lock:
+                paths = list(self._known)
+            for path in paths:
+                self.check(path)
+
+
+class _WatchHandler(FileSystemEventHandler):
+    def __init__(self, service: FileWatchService):
+        self.service = service
+
+    def on_any_event(self, event):
+        # os.replace shows up as a move onto the watched path
+        for path in (getattr(event, "src_path", None), getattr(event, "dest_path", None)):
+            if path:
+                self.service.check(path)
+
+
+@st.cache_resource
+def get_file_watch() -> FileWatchService:
+    return FileWatchService()
+
+
+def watch_active_profile():
+    s = st.session_state
+    watcher = get_file_watch()
+    s.sync_seen = {}
+    for path in (get_data_file(), get_profile_file()):
+        watcher.watch(path)
+        s.sync_seen[path] = watcher.version(path)
+
+
+@st.fragment(run_every=SYNC_CHECK_S)
+def sync_from_other_sessions():
+    """Refresh only the fields whose file another session or device changed."""
+    s = st.session_state
+    # reloading a file before this session's queued write to it lands would
+    # drop that write from what we show, so leave the file unseen until then
+    worker = get_persistence_worker()
+    paths = [path for path in s.sync_seen if not worker.has_pending(path, s.session_uid)]
+    changed = get_file_watch().changes(paths, s.sync_seen, s.session_uid)
+    if not changed:
+        return
+    if get_data_file() in changed:
+        load_today_from_file()
+    if get_profile_file() in changed:
+        load_profile()
+    st.rerun(scope="app")
+
+
+# ===================== HOUSEHOLD DASHBOARD =====================
+
+def summarize_profile(suffix: str, today: str, cache: ProfileCache = None) -> dict:
+    """Today/streak/XP summary for one profile, read without session state."""
+    data_file = get_data_file(suffix)
+    if cache is not None:
+        snap = cache.get(data_file)
+        history, streak = snap.history, snap.stats[0]
+    else:
+        history = load_history(data_file)
+        streak = compute_history_stats(history)[0]
+    raw = read_profile_file(get_profile_file(suffix))
+    if today in history:
+        intake, goal = history[today]
+    elif history:
+        intake, goal = 0, history[max(history)][1]
+    else:
+        intake, goal = 0, AGE_GUIDELINES["Adult (14-64)"]
+    xp = int(raw.get("xp", 0) or 0)
+    return {
+        "profile": suffix,
+        "today_ml": intake,
+        "goal_ml": goal,
+        "progress": min(1.0, intake / max(1, goal)),
+        "streak": streak,
+        "xp": xp,
+        "level": int(raw.get("level", 1 + xp // XP_PER_LEVEL) or 1),
+    }
+
+
+@st.cache_resource
+def get_household_pool() -> ThreadPoolExecutor:
+    # shared by every session so the number of concurrent readers stays bounded
+    return ThreadPoolExecutor(
+        max_workers=HOUSEHOLD_MAX_READERS, thread_name_prefix="household"
+    )
+
+
+def load_household(suffixes: list, budget_s: float = HOUSEHOLD_BUDGET_S):
+    """Summaries for all profiles, plus the ones that missed the latency budget."""
+    today = datetime.date.today().isoformat()
+    pool = get_household_pool()
+    cache = get_profile_cache()
+    futures = {
+        pool.submit(summarize_profile, sfx, today, cache): sfx for sfx in suffixes
+    }
+    done, not_done = wait(futures, timeout=budget_s)
+    for fut in not_done:
+        fut.cancel()
+    rows = [fut.result() for fut in done if fut.exception() is None]
+    rows.sort(key=lambda r: r["profile"])
+    failed = [futures[f] for f in done if f.exception() is not None]
+    return rows, sorted(failed + [futures[f] for f in not_done])
+
+
+# ===================== BACKGROUND REPORTS =====================
+
+class ReportService:
+    """Renders reports in a bounded process pool and caches the results.
+
+    Jobs are keyed by (profile, period, format, theme, day, data version), so
+    asking again for an unchanged period returns the existing job, finished or
+    not, instead of rendering it twice.
+    """
+
+    def __init__(self, max_workers: int, max_entries: int):
+        self.max_entries = max_entries
+        # spawn: never fork a process that is running server threads
+        self._pool = ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, job: dict) -> tuple:
+        key = (job["profile"], job["period"], job["fmt"], job["dark_mode"],
+               job["as_of"], job["version"])
+        with self._lock:
+            fut = self._jobs.get(key)
+            if fut is not None and not (fut.done() and fut.exception() is not None):
+                self._jobs.move_to_end(key)
+                return key
+            self._jobs[key] = self._pool.submit(reports.render_report, job)
+            for old_key in list(self._jobs):
+                if len(self._jobs) <= self.max_entries:
+                    break
+                if self._jobs[old_key].done():
+                    del self._jobs[old_key]
+        return key
+
+    def status(self, key) -> str:
+        with self._lock:
+            fut = self._jobs.get(key)
+        if fut is None:
+            return "missing"
+        if not fut.done():
+            return "running"
+        return "failed" if fut.exception() is not None else "done"
+
+    def result(self, key) -> bytes:
+        """The rendered report, or None unless the job is cached and done."""
+        with self._lock:
+            fut = self._jobs.get(key)
+        # evicted between status() and here, or not (successfully) finished
+        if fut is None or not fut.done() or fut.exception() is not None:
+            return None
+        return fut.result()
+
+
+@st.cache_resource
+def get_report_service() -> ReportService:
+    return ReportService(REPORT_MAX_WORKERS, REPORT_CACHE_ENTRIES)
+
+
+def report_job(period: str, fmt: str) -> dict:
+    data_file = os.path.abspath(get_data_file())
+    profile_file = os.path.abspath(get_profile_file())
+    return {
+        "profile": st.session_state.profile_name,
+        "data_file": data_file,
+        "profile_file": profile_file,
+        "period": period,
+        "fmt": fmt,
+        "dark_mode": bool(st.session_state.dark_mode),
+        "as_of": datetime.date.today().isoformat(),
+        "version": (file_version(data_file), file_version(profile_file)),
+    }
+
+
+@st.fragment(run_every=REPORT_POLL_S)
+def report_progress():
+    """Poll a running report job; only rendered (and so only timed) while it
+    runs, and reruns the app once it has finished."""
+    if get_report_service().status(st.session_state.report_key) != "running":
+        st.rerun(scope="app")
+    st.info("Rendering your report in the background…")
+
+
+def report_status():
+    key = st.session_state.report_key
+    if key is None:
+        return
+    service = get_report_service()
+    status = service.status(key)
+    if status == "running":
+        report_progress()
+        return
+    data = service.result(key)
+    if data is not None:
+        profile, period, fmt = key[0], key[1], key[2]
+        st.download_button(
+            "⬇️ Download report",
+            data,
+            file_name=f"waterbuddy_{profile_suffix(profile)}_{period}.{fmt.lower()}",
+            mime="application/pdf" if fmt == "PDF" else "image/png",
+        )
+    elif status == "failed":
+        st.error("Report generation failed. Please try again.")
 
 
 # ===================== TURTLE MASCOT (PIL IMAGE) =====================
 
+def turtle_cosmetics() -> dict:
+    return {key: st.session_state[key] for key in COSMETIC_KEYS}
+
+
 def draw_turtle_image(percent: float) -> Image.Image:
+    return render_turtle(percent, st.session_state.dark_mode, turtle_cosmetics())
+
+
+# ===================== HISTORY TIME-LAPSE =====================
+
+def timelapse_layers(dark_mode: bool, cosmetics: dict):
+    """Palette-indexed layers shared by every frame of a time-lapse.
+
+    Returns (palette, backdrop indices, water index, {pose: (indices, mask)}).
+    The PIL drawing code runs once per pose; frames are then composed from
+    these arrays with NumPy only.
+    """
+    backdrop = Image.new("RGBA", TURTLE_SIZE, (0, 0, 0, 0))
+    draw_backdrop(ImageDraw.Draw(backdrop), dark_mode)
+    page = Image.new("RGBA", TURTLE_SIZE, TIMELAPSE_PAGE_RGB[dark_mode] + (255,))
+    backdrop_rgb = np.asarray(Image.alpha_composite(page, backdrop).convert("RGB"))
+
+    overlays = {}
+    for pose in ("Neutral", "Happy", "Wave", "Celebrate"):
+        layer = Image.new("RGBA", TURTLE_SIZE, (0, 0, 0, 0))
+        d = ImageDraw.Draw(layer)
+        draw_turtle(d, pose, cosmetics)
+        if pose == "Celebrate":
+            # fixed seed so every celebrate frame is identical and dedupes
+            draw_confetti(d, random.Random(0))
+        arr = np.asarray(layer)
+        overlays[pose] = (arr[..., :3], arr[..., 3] > 0)
+
+    # all layers are flat fills, so one small shared palette covers every frame
+    colors = [backdrop_rgb.reshape(-1, 3), np.array([WATER_RGBA[:3]], dtype=np.uint8)]
+    colors += [rgb[mask] for rgb, mask in overlays.values()]
+    palette, inverse = np.unique(np.concatenate(colors), axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    if len(palette) > 256:
+        # P-mode frames index at most 256 colours; map onto a quantized palette
+        reduced = Image.fromarray(palette.reshape(1, -1, 3).astype(np.uint8)).quantize(256)
+        inverse = np.asarray(reduced).reshape(-1)[inverse]
+        palette = np.asarray(reduced.getpalette()[:768], dtype=np.uint8).reshape(-1, 3)
+    inverse = inverse.astype(np.uint8)
+
+    h, w = backdrop_rgb.shape[:2]
+    pos = h * w
+    backdrop_idx = inverse[:pos].reshape(h, w)
+    water_idx = inverse[pos]
+    pos += 1
+    pose_layers = {}
+    for pose, (rgb, mask) in overlays.items():
+        n = int(mask.sum())
+        idx = np.zeros((h, w), dtype=np.uint8)
+        idx[mask] = inverse[pos:pos + n]
+        pos += n
+        pose_layers[pose] = (idx, mask)
+    return palette, backdrop_idx, water_idx, pose_layers
+
+
+def timelapse_keys(history) -> list:
+    """Run-length encoded (water line, pose) per day, oldest first."""
+    runs = []
+    for d in sorted(history):
+        intake, goal = history[d]
+        percent = intake / max(1, goal) * 100
+        key = (water_line(percent), mascot_state(percent))
+        if runs and runs[-1][0] == key:
+            runs[-1][1] += 1
+        else:
+            runs.append([key, 1])
+    return runs
+
+
+def render_timelapse(history, dark_mode: bool, cosmetics: dict,
+                     fmt: str = "GIF", frame_ms: int = TIMELAPSE_FRAME_MS) -> bytes:
+    """Animated GIF/WebP replaying one mascot frame per logged day.
+
+    Consecutive identical days become one longer frame, and distinct frames
+    are composed lazily, so memory is bounded by the number of distinct
+    frames rather than the number of days.
+    """
+    runs = timelapse_keys(history)
+    if not runs:
+        return b""
+    palette, backdrop_idx, water_idx, pose_layers = timelapse_layers(dark_mode, cosmetics)
+    flat_palette = palette.astype(np.uint8).reshape(-1).tolist()
+    frames = {}
+
+    def frame(key):
+        if key not in frames:
+            top, pose = key
+            idx = backdrop_idx.copy()
+            idx[top:] = water_idx
+            overlay, mask = pose_layers[pose]
+            idx[mask] = overlay[mask]
+            img = Image.fromarray(idx, mode="P")
+            img.putpalette(flat_palette)
+            frames[key] = img
+        return frames[key]
+
+    buf = io.BytesIO()
+    first = frame(runs[0][0])
+    first.save(
+        buf,
+        format=fmt,
+        save_all=True,
+        append_images=(frame(key) for key, _ in runs[1:]),
+        duration=[frame_ms * count for _, count in runs],
+        loop=0,
+    )
+    return buf.getvalue()
+
+
+# ===================== LOG WATER PANEL =====================
+
+@st.fragment
+def log_water_panel():
+    """Quick-add buttons. A tap reruns only this fragment and queues the drink;
+    drink_queue_timer applies the burst once the taps pause."""
     s = st.session_state
-    state = mascot_state(percent)
-    p = max(0.0, min(1.5, percent / 100.0))
-
-    img = Image.new("RGBA", (320, 220), (0, 0, 0, 0))
-    d = ImageDraw.Draw(img)
-
-    if s.dark_mode:
-        glow_radius = 90
-        center_x, center_y = 160, 110
-        d.ellipse(
-            [
-                (center_x - glow_radius, center_y - glow_radius),
-                (center_x + glow_radius, center_y + glow_radius),
-            ],
-            fill=(255, 255, 255, 30) 
+    c_fast, c_custom = st.columns([2, 1])
+
+    with c_fast:
+        st.markdown("**Quick add**")
+        labels = [
+            f"+{s.quick1} ml",
+            f"+{s.quick2} ml",
+            f"+{s.quick3} ml",
+            "+1 L",
+        ]
+        amounts = [s.quick1, s.quick2, s.quick3, 1000]
+        b1, b2, b3, b4 = st.columns(4)
+        for btn, label, amt in zip((b1, b2, b3, b4), labels, amounts):
+            btn.button(label, on_click=queue_drink, args=(int(amt),))
+
+    with c_custom:
+        st.markdown("**Custom amount**")
+        st.number_input(
+            "Amount (ml)", min_value=1, step=50, value=150,
+            key="custom_amount", label_visibility="collapsed"
         )
+        st.button("Add Custom", on_click=queue_custom_drink)
 
-    water_top = int(170 - 100 * min(1.0, p))
-    d.rectangle([0, water_top, 320, 220], fill=(200, 230, 255, 255))
-
-    shell_center = (150, 130)
-    shell_radius = 55
-    shell_color = (80, 160, 80, 255)
-    if s.has_party_shell:
-        shell_color = (120, 180, 255, 255)
-
-    d.ellipse(
-        [
-            (shell_center[0] - shell_radius, shell_center[1] - shell_radius),
-            (shell_center[0] + shell_radius, shell_center[1] + shell_radius),
-        ],
-        fill=shell_color,
-        outline=(40, 100, 40, 255),
-        width=3,
-    )
-    d.line([(shell_center[0] - shell_radius, shell_center[1]),
-            (shell_center[0] + shell_radius, shell_center[1])],
-           fill=(40, 100, 40, 255), width=2)
-    d.line([(shell_center[0], shell_center[1] - shell_radius),
-            (shell_center[0], shell_center[1] + shell_radius)],
-           fill=(40, 100, 40, 255), width=2)
-
-    head_center = (shell_center[0] + shell_radius + 25, shell_center[1] - 20)
-    head_radius = 22
-    d.ellipse(
-        [
-            (head_center[0] - head_radius, head_center[1] - head_radius),
-            (head_center[0] + head_radius, head_center[1] + head_radius),
-        ],
-        fill=(140, 200, 120, 255),
-        outline=(40, 100, 40, 255),
-        width=2,
-    )
+    if s.drink_queue:
+        # only rendered while taps are queued, so idle sessions have no timer
+        drink_queue_timer()
 
-    eye_y = head_center[1] - 5
-    d.ellipse([(head_center[0] - 10, eye_y - 4),
-               (head_center[0] - 4, eye_y + 2)],
-              fill=(0, 0, 0, 255))
-    d.ellipse([(head_center[0] + 4, eye_y - 4),
-               (head_center[0] + 10, eye_y + 2)],
-              fill=(0, 0, 0, 255))
-
-    if s.has_sunglasses:
-        d.rectangle([(head_center[0] - 12, eye_y - 6),
-                     (head_center[0] - 2, eye_y + 4)],
-                    fill=(0, 0, 0, 255))
-        d.rectangle([(head_center[0] + 2, eye_y - 6),
-                     (head_center[0] + 12, eye_y + 4)],
-                    fill=(0, 0, 0, 255))
-        d.line([(head_center[0] - 2, eye_y),
-                (head_center[0] + 2, eye_y)], fill=(0, 0, 0, 255), width=2)
-
-    mouth_top = head_center[1] + 8
-    if state in ("Happy", "Wave", "Celebrate"):
-        d.arc([(head_center[0] - 10, mouth_top - 4),
-               (head_center[0] + 10, mouth_top + 8)],
-              start=0, end=180, fill=(0, 0, 0, 255), width=2)
-    else:
-        d.line([(head_center[0] - 8, mouth_top),
-                (head_center[0] + 8, mouth_top)], fill=(0, 0, 0, 255), width=2)
-
-    leg_y = shell_center[1] + shell_radius - 5
-    d.rectangle([(shell_center[0] - 35, leg_y),
-                 (shell_center[0] - 15, leg_y + 18)],
-                fill=(140, 200, 120, 255))
-    d.rectangle([(shell_center[0] + 15, leg_y),
-                 (shell_center[0] + 35, leg_y + 18)],
-                fill=(140, 200, 120, 255))
-
-    front_leg_base = (shell_center[0] + 5, shell_center[1])
-    if state == "Wave":
-        d.rectangle([(front_leg_base[0], front_leg_base[1] - 30),
-                     (front_leg_base[0] + 16, front_leg_base[1] - 5)],
-                    fill=(140, 200, 120, 255))
-    else:
-        d.rectangle([(front_leg_base[0], front_leg_base[1] + 3),
-                     (front_leg_base[0] + 16, front_leg_base[1] + 28)],
-                    fill=(140, 200, 120, 255))
-
-    if s.has_bandana:
-        d.polygon([(shell_center[0] - 30, shell_center[1] - shell_radius - 5),
-                   (shell_center[0] + 10, shell_center[1] - shell_radius - 5),
-                   (shell_center[0] - 10, shell_center[1] - shell_radius + 15)],
-                  fill=(220, 40, 90, 255))
-
-    if s.has_crown:
-        cx, cy = head_center[0], head_center[1] - head_radius - 4
-        d.polygon([(cx - 18, cy + 14),
-                   (cx - 8, cy - 4),
-                   (cx, cy + 14),
-                   (cx + 8, cy - 4),
-                   (cx + 18, cy + 14)],
-                  fill=(250, 210, 80, 255),
-                  outline=(160, 130, 30, 255))
-
-    if state == "Celebrate":
-        for x in range(20, 300, 40):
-            for y in range(20, 80, 20):
-                d.rectangle([(x, y), (x + 4, y + 8)],
-                            fill=(random.randint(50, 255),
-                                  random.randint(50, 255),
-                                  random.randint(50, 255), 255))
-    return img
+
+@st.fragment(run_every=DRINK_DEBOUNCE_S)
+def drink_queue_timer():
+    """Apply the queued burst, and refresh the whole page, once no tap came
+    for DRINK_DEBOUNCE_S."""
+    s = st.session_state
+    if not s.drink_queue:
+        return
+    idle = (datetime.datetime.now() - s.drink_queue[-1][1]).total_seconds()
+    if idle >= DRINK_DEBOUNCE_S:
+        flush_drink_queue()
+        st.rerun(scope="app")
+    st.caption(f"⏳ +{sum(amount for amount, _ in s.drink_queue)} ml on the way…")
 
 
 # ===================== STYLING ENGINE =====================
@@ -657,6 +1693,10 @@ def main():
     # APPLY CSS IMMEDIATELY
     apply_styles()
 
+    # drinks tapped since the last run, applied before anything is rendered
+    if st.session_state.data_loaded:
+        flush_drink_queue()
+
     # profile selector FIRST, so files use correct suffix
     with st.sidebar:
         st.markdown("## 👤 Profile")
@@ -669,10 +1709,29 @@ def main():
             st.rerun()
 
     if not st.session_state.data_loaded:
+        if st.session_state.get("cache_lease") is not None:
+            st.session_state.cache_lease.release()
+        st.session_state.cache_lease = get_profile_cache().lease(get_data_file())
+        watch_active_profile()
+
+        # read-your-writes: this profile's queued writes land first, but a
+        # slow or failing disk only delays the load by a bounded time
+        worker = get_persistence_worker()
+        worker.flush(timeout=PERSIST_LOAD_TIMEOUT_S, paths=(get_data_file(), get_profile_file()))
         load_today_from_file()
         load_profile()
+        if st.session_state.badges_unlocked is None:
+            seed_badges_from_history(load_history_range(get_data_file()))
+        # closed years move to archive segments in the background
+        worker.put_retention(
+            get_data_file(), datetime.date.today().isoformat(),
+            origin=st.session_state.session_uid,
+        )
         st.session_state.data_loaded = True
 
+    # other tabs/devices on this profile: cheap in-memory version check
+    sync_from_other_sessions()
+
     # ---------- SIDEBAR (rest of settings) ----------
     with st.sidebar:
         st.markdown("## ⚙️ Settings")
@@ -686,7 +1745,6 @@ def main():
         if new_age != st.session_state.age_group:
             st.session_state.age_group = new_age
             recalc_goal_from_age_or_weight()
-            save_today_to_file()
             st.rerun()
 
         st.checkbox(
@@ -755,6 +1813,7 @@ def main():
         st.session_state.dark_mode = st.checkbox(
             "🌙 Dark Mode", value=st.session_state.dark_mode
         )
+        household_mode = st.checkbox("🏠 Household dashboard", value=False)
 
     # ---------- HEADER ----------
     st.markdown(
@@ -767,6 +1826,33 @@ def main():
         unsafe_allow_html=True,
     )
 
+    # level-ups and badges from this run's updates
+    show_notices()
+
+    worker = get_persistence_worker()
+    if worker.failing(get_data_file()) or worker.failing(get_profile_file()):
+        st.warning("Couldn't save your latest changes to disk; retrying in the background.")
+
+    # ---------- HOUSEHOLD OVERVIEW ----------
+    if household_mode:
+        st.markdown("### 🏠 Household")
+        suffixes = sorted(set(discover_profiles()) | {profile_suffix(p) for p in profiles})
+        rows, missing = load_household(suffixes)
+        if rows:
+            st.dataframe(
+                pd.DataFrame(rows),
+                hide_index=True,
+                use_container_width=True,
+                column_config={
+                    "progress": st.column_config.ProgressColumn(
+                        "Today", min_value=0.0, max_value=1.0
+                    ),
+                },
+            )
+        if missing:
+            st.caption(f"Not loaded in time: {', '.join(missing)}")
+        st.markdown("---")
+
     # reminder banner
     if st.session_state.reminder_minutes > 0 and st.session_state.last_drink_iso:
         try:
@@ -777,6 +1863,21 @@ def main():
         except Exception:
             pass
 
+    # adaptive reminder from the usual intraday curve
+    now = datetime.datetime.now()
+    roll_drink_pattern(now.date().isoformat())
+    expected = expected_intake(now)
+    if expected is not None:
+        usual_now, usual_day = expected
+        total_now = st.session_state.total_ml
+        if total_now < st.session_state.goal_ml and usual_now - total_now >= PATTERN_BEHIND_ML:
+            st.warning(
+                f"You're usually at {usual_now:.0f} ml by now — "
+                f"you're at {total_now} ml today."
+            )
+        projected = total_now + max(0.0, usual_day - usual_now)
+        st.caption(f"Projected end of day at your usual pace: **{projected:.0f} ml**")
+
     # progress + XP
     goal, total, remaining, percent = compute_progress()
     xp = st.session_state.xp
@@ -816,37 +1917,7 @@ def main():
 
     # ---------- LOG WATER ----------
     st.markdown("### Log Water")
-
-    c_fast, c_custom = st.columns([2, 1])
-
-    with c_fast:
-        st.markdown("**Quick add**")
-        labels = [
-            f"+{st.session_state.quick1} ml",
-            f"+{st.session_state.quick2} ml",
-            f"+{st.session_state.quick3} ml",
-            "+1 L",
-        ]
-        amounts = [
-            st.session_state.quick1,
-            st.session_state.quick2,
-            st.session_state.quick3,
-            1000,
-        ]
-        b1, b2, b3, b4 = st.columns(4)
-        for btn, label, amt in zip((b1, b2, b3, b4), labels, amounts):
-            if btn.button(label):
-                add_water(int(amt))
-                st.rerun()
-
-    with c_custom:
-        st.markdown("**Custom amount**")
-        custom_amt = st.number_input(
-            "Amount (ml)", min_value=1, step=50, value=150, label_visibility="collapsed"
-        )
-        if st.button("Add Custom"):
-            add_water(int(custom_amt))
-            st.rerun()
+    log_water_panel()
 
     if st.session_state.last_xp_gain > 0:
         st.caption(f"⭐ You earned +{st.session_state.last_xp_gain} XP for that drink!")
@@ -890,11 +1961,28 @@ def main():
     st.markdown("---")
 
     # ---------- HISTORY / ANALYTICS / BADGES ----------
-    history = load_history()
-    streak, best_date, best_intake, completion_rate, total_days, total_litres = \
-        compute_history_stats(history)
+    snapshot = get_profile_cache().get(get_data_file())
+    history = snapshot.history
+    stats = snapshot.stats
+    today_row = (st.session_state.total_ml, st.session_state.goal_ml)
+    today_key = datetime.date.today().isoformat()
+    today_pending = (st.session_state.total_ml > 0
+                     or get_persistence_worker().has_pending(get_data_file(),
+                                                             st.session_state.session_uid))
+    if today_pending and history.get(today_key) != today_row:
+        # today's write is still queued; overlay the live row
+        history = {**history, today_key: today_row}
+        stats = compute_alltime_stats(history, snapshot.archives)
+
+    def history_range(start=None, end=None):
+        # day-level rows incl. archived years, with today's live row on top
+        rows = snapshot.history_range(start, end)
+        if today_key in history and (not end or today_key <= end):
+            rows[today_key] = history[today_key]
+        return rows
+    streak, best_date, best_intake, completion_rate, total_days, total_litres = stats
     days7, total7, met7, avg7 = compute_weekly_summary(history)
-    badges = compute_badges(history, streak)
+    badges = badge_board()
 
     st.markdown("### 📊 History & Insights")
 
@@ -923,38 +2011,151 @@ def main():
 
     # Badges
     st.markdown("#### 🏅 Badges")
-    bcols = st.columns(len(badges))
-    for col, (name, (unlocked, desc)) in zip(bcols, badges.items()):
-        with col:
-            if unlocked:
-                st.success(name)
-            else:
-                st.button(name, disabled=True)
-            st.caption(desc)
+    badge_items = list(badges.items())
+    for row_start in range(0, len(badge_items), BADGES_PER_ROW):
+        row = badge_items[row_start:row_start + BADGES_PER_ROW]
+        bcols = st.columns(BADGES_PER_ROW)
+        for col, (name, (unlocked, desc)) in zip(bcols, row):
+            with col:
+                if unlocked:
+                    st.success(name)
+                else:
+                    st.button(name, disabled=True, key=f"badge_{name}")
+                st.caption(desc)
 
     with st.expander("📅 View Hydration History (Chart & Table)", expanded=False):
-        if not history:
+        if not history and not snapshot.archives:
             st.write("No history yet. Drink some water and it will be saved automatically.")
         else:
-            rows = [
-                {"date": d, "intake_ml": t, "goal_ml": g}
-                for d, (t, g) in sorted(history.items())
-            ]
-            df = pd.DataFrame(rows)
-            df["date"] = pd.to_datetime(df["date"])
+            df = snapshot.frame() if history is snapshot.history else history_frame(history)
 
             st.markdown("#### Trend")
             chart_df = df.set_index("date")[["intake_ml", "goal_ml"]]
             st.line_chart(chart_df)
 
+            st.markdown("#### Time-lapse")
+            lapse_days = st.selectbox(
+                "Replay", [30, 365, 0],
+                format_func=lambda n: "All time" if n == 0 else f"Last {n} days",
+            )
+            lapse_fmt = st.radio("Format", ["GIF", "WEBP"], horizontal=True)
+            if st.button("🎞️ Render time-lapse"):
+                lapse_start = None
+                if lapse_days:
+                    lapse_start = (datetime.date.today()
+                                   - datetime.timedelta(days=lapse_days - 1)).isoformat()
+                lapse = render_timelapse(
+                    history_range(lapse_start),
+                    st.session_state.dark_mode,
+                    turtle_cosmetics(),
+                    fmt=lapse_fmt,
+                )
+                st.image(lapse, caption="Your hydration time-lapse")
+                st.download_button(
+                    "Download", lapse,
+                    file_name=f"waterbuddy_timelapse.{lapse_fmt.lower()}",
+                    mime=f"image/{lapse_fmt.lower()}",
+                )
+
             st.markdown("#### Raw data")
-            st.dataframe(df.sort_values("date", ascending=False), use_container_width=True)
+            index = snapshot.index() if history is snapshot.history else HistoryIndex(history)
+            first_day = datetime.date.fromisoformat(snapshot.first_date() or today_key)
+            last_day = datetime.date.fromisoformat(index.dates[-1] if len(index) else today_key)
+            hot_first = datetime.date.fromisoformat(index.dates[0]) if len(index) else last_day
+            r1, r2, r3 = st.columns(3)
+            sort_col = r1.selectbox("Sort by", HistoryIndex.COLUMNS, key="raw_sort")
+            descending = r2.radio(
+                "Order", ["Descending", "Ascending"], horizontal=True, key="raw_order"
+            ) == "Descending"
+            page_size = r3.selectbox("Rows per page", [10, 25, 50, 100], index=1, key="raw_page_size")
+            date_range = st.date_input(
+                "Date range", value=(hot_first, last_day),
+                min_value=first_day, max_value=last_day, key="raw_dates",
+            )
+            start_day = date_range[0].isoformat() if len(date_range) > 0 else None
+            end_day = date_range[1].isoformat() if len(date_range) > 1 else None
+            if start_day and date_range[0] < hot_first:
+                # the filter reaches into archived years; only those are decompressed
+                index = HistoryIndex(history_range(start_day, end_day))
+
+            lo, hi = index.date_bounds(start_day, end_day)
+            matched = max(0, hi - lo)
+            pages = max(1, -(-matched // page_size))
+            page_no = st.number_input("Page", min_value=1, max_value=pages, value=1, key="raw_page")
+            page_df, matched = index.page(
+                start_day, end_day, sort=sort_col, descending=descending,
+                offset=(page_no - 1) * page_size, limit=page_size,
+            )
+            st.dataframe(page_df, hide_index=True, use_container_width=True)
+            shown_from = (page_no - 1) * page_size + 1 if matched else 0
+            st.caption(
+                f"Rows {shown_from}–{shown_from + len(page_df) - 1 if matched else 0} "
+                f"of {matched} matching ({total_days} days logged) · page {page_no} of {pages}"
+            )
+            if snapshot.archives:
+                st.caption(
+                    f"{len(snapshot.archives)} closed year(s) archived in compressed "
+                    f"segments; pick an earlier start date to browse them."
+                )
 
             st.caption(
                 f"History stored in `{get_data_file()}` and profile in `{get_profile_file()}` "
                 f"(simple local text files, no cloud database)."
             )
 
+    with st.expander("🔮 Goal what-if", expanded=False):
+        if not history and not snapshot.archives:
+            st.write("Log a few days first to compare goals.")
+        else:
+            include_archives = bool(snapshot.archives) and st.checkbox(
+                "Include archived years", value=False
+            )
+            sim_history = history_range() if include_archives else history
+            extra_str = st.text_input(
+                "Extra goals to compare (ml, comma-separated)", value=""
+            )
+            extra = [int(x) for x in extra_str.replace(" ", "").split(",")
+                     if x.isdigit() and int(x) > 0]
+            sim = simulate_goals(
+                sim_history, whatif_candidate_goals(extra + [st.session_state.goal_ml])
+            )
+            st.markdown("#### Days goal met (%) by goal")
+            st.line_chart(sim.set_index("goal_ml")[["completion_rate"]])
+            st.markdown("#### Current streak by goal")
+            st.line_chart(sim.set_index("goal_ml")[["streak"]])
+
+            picks = {f"{label} (age)": g for label, g in AGE_GUIDELINES.items()}
+            picks.update({f"{g} ml (manual)": g for g in extra})
+            picks["Current goal"] = st.session_state.goal_ml
+            by_goal = sim.set_index("goal_ml")
+            st.dataframe(
+                pd.DataFrame([
+                    {"goal": label, "goal_ml": g,
+                     "days_goal_met_%": round(by_goal.at[g, "completion_rate"], 1),
+                     "streak": int(by_goal.at[g, "streak"])}
+                    for label, g in picks.items()
+                ]),
+                hide_index=True,
+                use_container_width=True,
+            )
+
+    st.markdown("---")
+
+    # ---------- REPORTS ----------
+    st.markdown("### 📄 Reports")
+    rc1, rc2, rc3 = st.columns(3)
+    report_period = rc1.selectbox(
+        "Period", list(reports.REPORT_PERIOD_DAYS), format_func=str.title, key="report_period"
+    )
+    report_fmt = rc2.selectbox("Format", ["PDF", "PNG"], key="report_fmt")
+    if rc3.button("Generate report"):
+        # the report reads this profile's files, so let their queued writes land first
+        get_persistence_worker().flush(timeout=1.0, paths=(get_data_file(), get_profile_file()))
+        st.session_state.report_key = get_report_service().submit(
+            report_job(report_period, report_fmt)
+        )
+    report_status()
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,135 @@
+"""
+Batch hydration analytics for every profile in a data directory.
+
+Runs without a Streamlit server and reuses the stats/badge logic from core.py:
+
+    python batch_stats.py --data-dir . --format csv --output weekly.csv
+    python batch_stats.py --data-dir /srv/waterbuddy --format jsonl
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import core
+
+FIELDS = [
+    "profile",
+    "total_days",
+    "streak",
+    "completion_rate",
+    "best_date",
+    "best_intake_ml",
+    "total_litres",
+    "week_days_logged",
+    "week_total_ml",
+    "week_days_goal_met",
+    "week_avg_ml",
+    "xp",
+    "level",
+    "badges",
+]
+
+
+def profile_report(job) -> dict:
+    data_dir, suffix, segments = job
+    data_file = os.path.join(data_dir, core.data_file_name(suffix))
+    history = core.load_history(data_file)
+    raw = core.read_profile_file(os.path.join(data_dir, core.profile_file_name(suffix)))
+
+    # all-time figures include closed years from the archive segment footers
+    streak, best_date, best_intake, completion_rate, total_days, total_litres = \
+        core.compute_alltime_stats(history, core.read_archive_summaries(data_file, segments))
+    days7, total7, met7, avg7 = core.compute_weekly_summary(history)
+    unlocked = set(raw["badges"].split("|")) if raw.get("badges") else set()
+    badges = core.compute_badges(history, streak, unlocked)
+
+    return {
+        "profile": suffix,
+        "total_days": total_days,
+        "streak": streak,
+        "completion_rate": round(completion_rate, 2),
+        "best_date": best_date,
+        "best_intake_ml": best_intake,
+        "total_litres": round(total_litres, 3),
+        "week_days_logged": days7,
+        "week_total_ml": total7,
+        "week_days_goal_met": met7,
+        "week_avg_ml": round(avg7, 1),
+        "xp": int(raw.get("xp", 0) or 0),
+        "level": int(raw.get("level", 1) or 1),
+        "badges": [name for name, (earned, _) in badges.items() if earned],
+    }
+
+
+def safe_profile_report(job) -> dict:
+    """profile_report, with a failure turned into an error row so one bad
+    profile file does not abort the whole run."""
+    try:
+        return profile_report(job)
+    except Exception as e:
+        return {"profile": job[1], "error": f"{type(e).__name__}: {e}"}
+
+
+def iter_reports(data_dir: str, workers: int = None):
+    """Yield one report (or error row) per profile, in profile order."""
+    # one directory scan for every profile's archive segments
+    archives = core.archive_index(data_dir)
+    jobs = [
+        (data_dir, suffix, archives.get(os.path.join(data_dir, core.data_file_name(suffix)), []))
+        for suffix in core.discover_profiles(data_dir)
+    ]
+    if not jobs:
+        return
+    workers = workers or os.cpu_count() or 1
+    # large chunks keep per-task IPC overhead small on tens of thousands of profiles
+    chunksize = max(1, len(jobs) // (workers * 16))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(safe_profile_report, jobs, chunksize=chunksize)
+
+
+def write_reports(reports, out, fmt: str, errors=sys.stderr):
+    """Write reports to out and error rows to errors; returns (written, failed)."""
+    count = failed = 0
+    writer = None
+    if fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=FIELDS)
+        writer.writeheader()
+    for report in reports:
+        if "error" in report:
+            print(f"{report['profile']}: {report['error']}", file=errors)
+            failed += 1
+            continue
+        if writer is not None:
+            writer.writerow(dict(report, badges="|".join(report["badges"])))
+        else:
+            out.write(json.dumps(report) + "\n")
+        count += 1
+    return count, failed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Compute streaks, completion rates, badges and totals for all profiles."
+    )
+    parser.add_argument("--data-dir", default=".", help="directory holding water_log_*.txt files")
+    parser.add_argument("--format", choices=("csv", "jsonl"), default="jsonl")
+    parser.add_argument("--output", help="output file (default: stdout)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    reports = iter_reports(args.data_dir, args.workers)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as f:
+            count, failed = write_reports(reports, f, args.format)
+    else:
+        count, failed = write_reports(reports, sys.stdout, args.format)
+    print(f"Wrote {count} profile report(s), {failed} failed.", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
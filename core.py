@@ -0,0 +1,611 @@
+"""
+Hydration logic shared by app.py, reports.py and batch_stats.py.
+
+Profile files, history stats, badge rules, archive segments and the turtle
+mascot drawing. Nothing here imports Streamlit, so report workers and the
+batch CLI can use it without loading the app.
+"""
+import datetime
+import glob
+import json
+import operator
+import os
+import random
+import struct
+import zlib
+
+from PIL import Image, ImageDraw
+
+COSMETIC_KEYS = ("has_bandana", "has_sunglasses", "has_crown", "has_party_shell")
+
+# turtle mascot canvas and water colour
+TURTLE_SIZE = (320, 220)
+WATER_RGBA = (200, 230, 255, 255)
+
+# tiered retention: a year moves to a compressed archive segment once it
+# ended this many days ago (keeps weekly/monthly views on the hot file)
+ARCHIVE_HOT_DAYS = 60
+ARCHIVE_MAGIC = b"WBA1"
+
+# ---------- badge rules (data-defined) ----------
+# Each rule listens to one or more event types and compares one metric of the
+# event against a value. "drink" events carry goal_ratio (today's total / goal),
+# hour (hour of the drink) and month_total_ml; "day_close" events fire once a
+# day's goal is reached and carry goal_ratio and streak.
+
+BADGE_RULES = [
+    {"name": "First Day Complete", "desc": "Finish goal on any day.",
+     "events": ("drink", "day_close"), "metric": "goal_ratio", "op": ">=", "value": 1.0},
+    {"name": "Double Goal Day", "desc": "Drink at least 2× your goal in a day.",
+     "events": ("drink", "day_close"), "metric": "goal_ratio", "op": ">=", "value": 2.0},
+    {"name": "Early Bird", "desc": "Log a drink before 8 AM.",
+     "events": ("drink",), "metric": "hour", "op": "<", "value": 8},
+    {"name": "30 L Month", "desc": "Drink 30 litres in one calendar month.",
+     "events": ("drink",), "metric": "month_total_ml", "op": ">=", "value": 30000},
+    {"name": "60 L Month", "desc": "Drink 60 litres in one calendar month.",
+     "events": ("drink",), "metric": "month_total_ml", "op": ">=", "value": 60000},
+    {"name": "3-Day Streak", "desc": "Hit your goal 3 days in a row.",
+     "events": ("day_close",), "metric": "streak", "op": ">=", "value": 3},
+    {"name": "7-Day Streak", "desc": "Hit your goal 7 days in a row.",
+     "events": ("day_close",), "metric": "streak", "op": ">=", "value": 7},
+    {"name": "30-Day Streak", "desc": "Hit your goal 30 days in a row.",
+     "events": ("day_close",), "metric": "streak", "op": ">=", "value": 30},
+    {"name": "100-Day Streak", "desc": "Hit your goal 100 days in a row.",
+     "events": ("day_close",), "metric": "streak", "op": ">=", "value": 100},
+]
+
+BADGE_OPS = {">=": operator.ge, "<": operator.lt}
+
+BADGE_RULES_BY_EVENT = {}
+for _rule in BADGE_RULES:
+    for _event in _rule["events"]:
+        BADGE_RULES_BY_EVENT.setdefault(_event, []).append(_rule)
+
+# ---------- file helpers (multi-profile) ----------
+
+def profile_suffix(name: str) -> str:
+    return name.replace(" ", "_").lower()
+
+def data_file_name(suffix: str) -> str:
+    return f"water_log_{suffix}.txt"
+
+def profile_file_name(suffix: str) -> str:
+    return f"water_profile_{suffix}.txt"
+
+def discover_profiles(data_dir: str = ".") -> list:
+    """Profile suffixes that have a log or profile file in data_dir."""
+    suffixes = set()
+    for pattern, prefix in (("water_log_*.txt", "water_log_"),
+                            ("water_profile_*.txt", "water_profile_")):
+        for path in glob.glob(os.path.join(data_dir, pattern)):
+            suffixes.add(os.path.basename(path)[len(prefix):-len(".txt")])
+    return sorted(suffixes)
+
+
+# ===================== FILE I/O =====================
+
+def load_history(data_file: str) -> dict:
+    history = {}
+    if not os.path.exists(data_file):
+        return history
+    with open(data_file, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            parts = line.split(",")
+            if len(parts) != 3:
+                continue
+            d, t, g = parts
+            try:
+                history[d] = (int(t), int(g))
+            except ValueError:
+                continue
+    return history
+
+
+def read_profile_file(profile_file: str) -> dict:
+    """Raw key=value pairs of a profile file, without touching session state."""
+    values = {}
+    if not os.path.exists(profile_file):
+        return values
+    with open(profile_file, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if "=" not in line:
+                continue
+            k, v = line.split("=", 1)
+            values[k] = v
+    return values
+
+
+def write_log_rows(data_file: str, rows: dict, before_replace=None):
+    """Apply {date: (total, added, goal)} updates to a log file and rewrite it.
+
+    added ml go on top of total, or on top of the day's total in the file
+    when total is None, so concurrent drinks from several writers add up.
+    """
+    history = {}
+
+    if os.path.exists(data_file):
+        with open(data_file, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                parts = line.split(",")
+                if len(parts) != 3:
+                    continue
+                d, t, g = parts
+                try:
+                    history[d] = (int(t), int(g))
+                except ValueError:
+                    continue
+
+    for d, (total, added, goal) in rows.items():
+        if total is None:
+            total = history.get(d, (0, 0))[0]
+        history[d] = (total + added, goal)
+    write_file_atomic(
+        data_file, "".join(f"{d},{t},{g}\n" for d, (t, g) in sorted(history.items())),
+        before_replace,
+    )
+
+
+def write_file_atomic(path: str, content: str, before_replace=None):
+    """Write via a temp file and rename it over path.
+
+    before_replace, if given, is called with the temp file's file_version just
+    before the rename; the rename keeps mtime and size, so that is the
+    version path will have.
+    """
+    # readers in other sessions never see a half-written file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    if before_replace is not None:
+        before_replace(file_version(tmp_path))
+    os.replace(tmp_path, path)
+
+
+def file_version(path: str):
+    """(mtime_ns, size) of a file, or None if it does not exist."""
+    try:
+        st_ = os.stat(path)
+    except OSError:
+        return None
+    return (st_.st_mtime_ns, st_.st_size)
+
+
+# ===================== STATS / BADGES =====================
+
+def mascot_state(percent: float):
+    if percent < 50:
+        return "Neutral"
+    elif percent < 75:
+        return "Happy"
+    elif percent < 100:
+        return "Wave"
+    else:
+        return "Celebrate"
+
+
+def compute_history_stats(history: dict):
+    if not history:
+        return 0, None, 0, 0.0, 0, 0.0
+
+    dates = sorted(history.keys())
+    total_days = len(dates)
+
+    completed = 0
+    total_litres = 0.0
+    best_intake = 0
+    best_date = None
+
+    for d in dates:
+        intake, goal = history[d]
+        if intake >= goal:
+            completed += 1
+        if intake > best_intake:
+            best_intake = intake
+            best_date = d
+        total_litres += intake / 1000.0
+
+    completion_rate = completed / total_days * 100.0
+
+    streak = 0
+    last_date = datetime.date.fromisoformat(dates[-1])
+    current = last_date
+    date_set = set(dates)
+
+    while True:
+        d_str = current.isoformat()
+        if d_str not in date_set:
+            break
+        intake, goal = history[d_str]
+        if intake < goal:
+            break
+        streak += 1
+        current = current - datetime.timedelta(days=1)
+
+    return streak, best_date, best_intake, completion_rate, total_days, total_litres
+
+
+def compute_weekly_summary(history: dict, days: int = 7, today: datetime.date = None):
+    if not history:
+        return 0, 0, 0, 0.0
+    today = today or datetime.date.today()
+    total_intake = 0
+    days_count = 0
+    days_goal_met = 0
+    for i in range(days):
+        d = (today - datetime.timedelta(days=i)).isoformat()
+        if d in history:
+            intake, goal = history[d]
+            days_count += 1
+            total_intake += intake
+            if intake >= goal:
+                days_goal_met += 1
+    if days_count == 0:
+        return 0, 0, 0, 0.0
+    avg_intake = total_intake / days_count
+    return days_count, total_intake, days_goal_met, avg_intake
+
+
+def compute_badges(history: dict, streak: int, unlocked=()):
+    """Full evaluation of BADGE_RULES over a history (used for backfills).
+
+    Only metrics derivable from daily totals are checked here; rules on other
+    metrics (e.g. drink hour) count as earned only if already in `unlocked`.
+    """
+    best_ratio = 0.0
+    month_totals = {}
+    for d, (intake, goal) in history.items():
+        best_ratio = max(best_ratio, intake / max(1, goal))
+        month_totals[d[:7]] = month_totals.get(d[:7], 0) + intake
+    metrics = {
+        "goal_ratio": best_ratio,
+        "streak": streak,
+        "month_total_ml": max(month_totals.values(), default=0),
+    }
+
+    badges = {}
+    for rule in BADGE_RULES:
+        metric = metrics.get(rule["metric"])
+        earned = rule["name"] in unlocked or (
+            metric is not None and BADGE_OPS[rule["op"]](metric, rule["value"])
+        )
+        badges[rule["name"]] = (earned, rule["desc"])
+    return badges
+
+
+# ===================== ARCHIVE SEGMENTS / RETENTION =====================
+# Segment layout: zlib("date,total,goal" lines) + JSON summary footer
+# + footer length (uint32 LE) + ARCHIVE_MAGIC. The footer can be read from the
+# end of the file without decompressing any day-level data.
+
+def archive_path(data_file: str, year: int) -> str:
+    return f"{data_file[:-len('.txt')]}.{year}.wba"
+
+
+def list_archives(data_file: str) -> list:
+    """(year, path) of every archive segment of a log file, oldest first."""
+    segments = []
+    for path in glob.glob(f"{glob.escape(data_file[:-len('.txt')])}.*.wba"):
+        year = path[:-len(".wba")].rsplit(".", 1)[-1]
+        if year.isdigit():
+            segments.append((int(year), path))
+    return sorted(segments)
+
+
+def archive_index(data_dir: str = ".") -> dict:
+    """{log file: [(year, path), ...]} for every segment in data_dir.
+
+    One directory scan for all profiles; callers that handle many profiles
+    pass each one its entry instead of calling list_archives per profile.
+    """
+    index = {}
+    with os.scandir(data_dir) as entries:
+        for entry in entries:
+            if not entry.name.endswith(".wba"):
+                continue
+            base, _, year = entry.name[:-len(".wba")].rpartition(".")
+            if base and year.isdigit():
+                data_file = os.path.join(data_dir, f"{base}.txt")
+                index.setdefault(data_file, []).append((int(year), entry.path))
+    for segments in index.values():
+        segments.sort()
+    return index
+
+
+def segment_summary(rows: dict) -> dict:
+    dates = sorted(rows)
+    met = [rows[d][0] >= rows[d][1] for d in dates]
+    best_date, best_intake = None, 0
+    for d in dates:
+        if rows[d][0] > best_intake:
+            best_date, best_intake = d, rows[d][0]
+
+    # goal-met days running up to last_date, for streaks crossing segments
+    tail_streak = 0
+    expected = datetime.date.fromisoformat(dates[-1])
+    for d, ok in zip(reversed(dates), reversed(met)):
+        if not ok or datetime.date.fromisoformat(d) != expected:
+            break
+        tail_streak += 1
+        expected -= datetime.timedelta(days=1)
+
+    return {
+        "first_date": dates[0],
+        "last_date": dates[-1],
+        "days": len(dates),
+        "total_ml": sum(rows[d][0] for d in dates),
+        "goal_met_days": sum(met),
+        "best_date": best_date,
+        "best_intake": best_intake,
+        "tail_streak": tail_streak,
+    }
+
+
+def write_archive_segment(path: str, rows: dict):
+    body = zlib.compress(
+        "".join(f"{d},{t},{g}\n" for d, (t, g) in sorted(rows.items())).encode("utf-8"), 9
+    )
+    footer = json.dumps(segment_summary(rows)).encode("utf-8")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(body + footer + struct.pack("<I", len(footer)) + ARCHIVE_MAGIC)
+    os.replace(tmp_path, path)
+
+
+def read_archive_summary(path: str) -> dict:
+    with open(path, "rb") as f:
+        f.seek(-8, os.SEEK_END)
+        size_bytes, magic = f.read(4), f.read(4)
+        if magic != ARCHIVE_MAGIC:
+            raise ValueError(f"{path} is not a WaterBuddy archive segment")
+        size = struct.unpack("<I", size_bytes)[0]
+        f.seek(-8 - size, os.SEEK_END)
+        return json.loads(f.read(size).decode("utf-8"))
+
+
+def read_archive_rows(path: str) -> dict:
+    with open(path, "rb") as f:
+        data = f.read()
+    size = struct.unpack("<I", data[-8:-4])[0]
+    rows = {}
+    for line in zlib.decompress(data[:-8 - size]).decode("utf-8").splitlines():
+        d, t, g = line.split(",")
+        rows[d] = (int(t), int(g))
+    return rows
+
+
+def read_archive_summaries(data_file: str, segments=None) -> list:
+    """Footers of a log file's segments (segments: list_archives result)."""
+    if segments is None:
+        segments = list_archives(data_file)
+    summaries = []
+    for _, path in segments:
+        try:
+            summaries.append(read_archive_summary(path))
+        except (OSError, ValueError):
+            continue
+    return summaries
+
+
+def apply_retention(data_file: str, today: datetime.date, before_replace=None) -> list:
+    """Move closed years out of the hot log file into archive segments."""
+    history = load_history(data_file)
+    cutoff = today - datetime.timedelta(days=ARCHIVE_HOT_DAYS)
+    by_year = {}
+    for d, row in history.items():
+        year = int(d[:4])
+        if datetime.date(year, 12, 31) < cutoff:
+            by_year.setdefault(year, {})[d] = row
+    if not by_year:
+        return []
+
+    for year, rows in by_year.items():
+        path = archive_path(data_file, year)
+        if os.path.exists(path):
+            rows = {**read_archive_rows(path), **rows}
+        write_archive_segment(path, rows)
+    # segments are on disk before the hot file drops those rows
+    hot = {d: row for d, row in history.items() if int(d[:4]) not in by_year}
+    write_file_atomic(
+        data_file, "".join(f"{d},{t},{g}\n" for d, (t, g) in sorted(hot.items())),
+        before_replace,
+    )
+    return sorted(by_year)
+
+
+def load_history_range(data_file: str, start: str = None, end: str = None,
+                       hot: dict = None, segments=None) -> dict:
+    """History between start and end, decompressing only overlapping segments."""
+    if segments is None:
+        segments = list_archives(data_file)
+    history = {}
+    for year, path in segments:
+        if (start and f"{year}-12-31" < start) or (end and f"{year}-01-01" > end):
+            continue
+        history.update(read_archive_rows(path))
+    history.update(load_history(data_file) if hot is None else hot)
+    return {
+        d: row for d, row in history.items()
+        if (not start or d >= start) and (not end or d <= end)
+    }
+
+
+def compute_alltime_stats(history, summaries: list):
+    """compute_history_stats over hot rows plus archive summaries."""
+    if not summaries:
+        return compute_history_stats(history)
+    hot_stats = compute_history_stats(history)
+    streak = hot_stats[0]
+
+    total_days = len(history)
+    completed = sum(1 for intake, goal in history.values() if intake >= goal)
+    total_litres = hot_stats[5]
+    best_date, best_intake = None, 0
+    for summary in summaries:
+        total_days += summary["days"]
+        completed += summary["goal_met_days"]
+        total_litres += summary["total_ml"] / 1000.0
+        if summary["best_intake"] > best_intake:
+            best_date, best_intake = summary["best_date"], summary["best_intake"]
+    if hot_stats[2] > best_intake:
+        best_date, best_intake = hot_stats[1], hot_stats[2]
+
+    # extend the streak back through segments while it stays unbroken
+    reaches_back = streak == len(history)
+    first_day = min(history) if history else None
+    for summary in reversed(summaries):
+        if not reaches_back:
+            break
+        last = datetime.date.fromisoformat(summary["last_date"])
+        if first_day and (last + datetime.timedelta(days=1)).isoformat() != first_day:
+            break
+        streak += summary["tail_streak"]
+        reaches_back = summary["tail_streak"] == summary["days"]
+        first_day = summary["first_date"]
+
+    completion_rate = completed / total_days * 100.0 if total_days else 0.0
+    return streak, best_date, best_intake, completion_rate, total_days, total_litres
+
+
+# ===================== TURTLE MASCOT (PIL IMAGE) =====================
+
+def render_turtle(percent: float, dark_mode: bool, cosmetics: dict, rng=random) -> Image.Image:
+    state = mascot_state(percent)
+    img = Image.new("RGBA", TURTLE_SIZE, (0, 0, 0, 0))
+    d = ImageDraw.Draw(img)
+    draw_backdrop(d, dark_mode)
+    d.rectangle([0, water_line(percent), 320, 220], fill=WATER_RGBA)
+    draw_turtle(d, state, cosmetics)
+    if state == "Celebrate":
+        draw_confetti(d, rng)
+    return img
+
+
+def water_line(percent: float) -> int:
+    p = max(0.0, min(1.5, percent / 100.0))
+    return int(170 - 100 * min(1.0, p))
+
+
+def draw_backdrop(d: ImageDraw.ImageDraw, dark_mode: bool):
+    if dark_mode:
+        glow_radius = 90
+        center_x, center_y = 160, 110
+        d.ellipse(
+            [
+                (center_x - glow_radius, center_y - glow_radius),
+                (center_x + glow_radius, center_y + glow_radius),
+            ],
+            fill=(255, 255, 255, 30) 
+        )
+
+
+def draw_confetti(d: ImageDraw.ImageDraw, rng=random):
+    for x in range(20, 300, 40):
+        for y in range(20, 80, 20):
+            d.rectangle([(x, y), (x + 4, y + 8)],
+                        fill=(rng.randint(50, 255),
+                              rng.randint(50, 255),
+                              rng.randint(50, 255), 255))
+
+
+def draw_turtle(d: ImageDraw.ImageDraw, state: str, cosmetics: dict):
+    shell_center = (150, 130)
+    shell_radius = 55
+    shell_color = (80, 160, 80, 255)
+    if cosmetics.get("has_party_shell"):
+        shell_color = (120, 180, 255, 255)
+
+    d.ellipse(
+        [
+            (shell_center[0] - shell_radius, shell_center[1] - shell_radius),
+            (shell_center[0] + shell_radius, shell_center[1] + shell_radius),
+        ],
+        fill=shell_color,
+        outline=(40, 100, 40, 255),
+        width=3,
+    )
+    d.line([(shell_center[0] - shell_radius, shell_center[1]),
+            (shell_center[0] + shell_radius, shell_center[1])],
+           fill=(40, 100, 40, 255), width=2)
+    d.line([(shell_center[0], shell_center[1] - shell_radius),
+            (shell_center[0], shell_center[1] + shell_radius)],
+           fill=(40, 100, 40, 255), width=2)
+
+    head_center = (shell_center[0] + shell_radius + 25, shell_center[1] - 20)
+    head_radius = 22
+    d.ellipse(
+        [
+            (head_center[0] - head_radius, head_center[1] - head_radius),
+            (head_center[0] + head_radius, head_center[1] + head_radius),
+        ],
+        fill=(140, 200, 120, 255),
+        outline=(40, 100, 40, 255),
+        width=2,
+    )
+
+    eye_y = head_center[1] - 5
+    d.ellipse([(head_center[0] - 10, eye_y - 4),
+               (head_center[0] - 4, eye_y + 2)],
+              fill=(0, 0, 0, 255))
+    d.ellipse([(head_center[0] + 4, eye_y - 4),
+               (head_center[0] + 10, eye_y + 2)],
+              fill=(0, 0, 0, 255))
+
+    if cosmetics.get("has_sunglasses"):
+        d.rectangle([(head_center[0] - 12, eye_y - 6),
+                     (head_center[0] - 2, eye_y + 4)],
+                    fill=(0, 0, 0, 255))
+        d.rectangle([(head_center[0] + 2, eye_y - 6),
+                     (head_center[0] + 12, eye_y + 4)],
+                    fill=(0, 0, 0, 255))
+        d.line([(head_center[0] - 2, eye_y),
+                (head_center[0] + 2, eye_y)], fill=(0, 0, 0, 255), width=2)
+
+    mouth_top = head_center[1] + 8
+    if state in ("Happy", "Wave", "Celebrate"):
+        d.arc([(head_center[0] - 10, mouth_top - 4),
+               (head_center[0] + 10, mouth_top + 8)],
+              start=0, end=180, fill=(0, 0, 0, 255), width=2)
+    else:
+        d.line([(head_center[0] - 8, mouth_top),
+                (head_center[0] + 8, mouth_top)], fill=(0, 0, 0, 255), width=2)
+
+    leg_y = shell_center[1] + shell_radius - 5
+    d.rectangle([(shell_center[0] - 35, leg_y),
+                 (shell_center[0] - 15, leg_y + 18)],
+                fill=(140, 200, 120, 255))
+    d.rectangle([(shell_center[0] + 15, leg_y),
+                 (shell_center[0] + 35, leg_y + 18)],
+                fill=(140, 200, 120, 255))
+
+    front_leg_base = (shell_center[0] + 5, shell_center[1])
+    if state == "Wave":
+        d.rectangle([(front_leg_base[0], front_leg_base[1] - 30),
+                     (front_leg_base[0] + 16, front_leg_base[1] - 5)],
+                    fill=(140, 200, 120, 255))
+    else:
+        d.rectangle([(front_leg_base[0], front_leg_base[1] + 3),
+                     (front_leg_base[0] + 16, front_leg_base[1] + 28)],
+                    fill=(140, 200, 120, 255))
+
+    if cosmetics.get("has_bandana"):
+        d.polygon([(shell_center[0] - 30, shell_center[1] - shell_radius - 5),
+                   (shell_center[0] + 10, shell_center[1] - shell_radius - 5),
+                   (shell_center[0] - 10, shell_center[1] - shell_radius + 15)],
+                  fill=(220, 40, 90, 255))
+
+    if cosmetics.get("has_crown"):
+        cx, cy = head_center[0], head_center[1] - head_radius - 4
+        d.polygon([(cx - 18, cy + 14),
+                   (cx - 8, cy - 4),
+                   (cx, cy + 14),
+                   (cx + 8, cy - 4),
+                   (cx + 18, cy + 14)],
+                  fill=(250, 210, 80, 255),
+                  outline=(160, 130, 30, 255))
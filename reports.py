@@ -0,0 +1,125 @@
+"""
+Weekly / monthly hydration reports rendered as PNG or PDF.
+
+render_report runs inside the report process pool started by app.py, so it
+only takes plain data (paths, period, format) and reads the profile files
+itself.
+"""
+import datetime
+import io
+import os
+import random
+
+from PIL import Image, ImageDraw, ImageFont
+
+import core
+
+REPORT_PERIOD_DAYS = {"week": 7, "month": 30}
+REPORT_SIZE = (900, 1150)
+REPORT_COLORS = {
+    False: {"page": (255, 255, 255), "text": (20, 20, 20), "muted": (110, 110, 110),
+            "bar": (37, 99, 235), "met": (76, 175, 80), "goal": (220, 40, 90)},
+    True: {"page": (14, 17, 23), "text": (250, 250, 250), "muted": (160, 160, 160),
+           "bar": (96, 165, 250), "met": (76, 175, 80), "goal": (244, 114, 182)},
+}
+
+
+def report_font(size: int):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1 has a single fixed-size bitmap font
+        return ImageFont.load_default()
+
+
+def draw_intake_chart(d: ImageDraw.ImageDraw, box, days: list, history: dict, colors: dict):
+    """Daily intake bars with each day's goal as a tick."""
+    left, top, right, bottom = box
+    d.rectangle(box, outline=colors["muted"], width=1)
+    peak = max([1] + [max(history.get(day, (0, 0))) for day in days])
+    slot = (right - left) / len(days)
+    bar_w = max(2, int(slot * 0.7))
+    scale = (bottom - top - 10) / peak
+    small = report_font(12)
+
+    for i, day in enumerate(days):
+        x0 = int(left + i * slot + (slot - bar_w) / 2)
+        intake, goal = history.get(day, (0, 0))
+        if intake:
+            fill = colors["met"] if goal and intake >= goal else colors["bar"]
+            d.rectangle([x0, int(bottom - intake * scale), x0 + bar_w, bottom], fill=fill)
+        if goal:
+            y = int(bottom - goal * scale)
+            d.line([(x0 - 2, y), (x0 + bar_w + 2, y)], fill=colors["goal"], width=3)
+        if len(days) <= 7 or i % 5 == 0:
+            d.text((x0, bottom + 6), day[5:], fill=colors["muted"], font=small)
+
+
+def render_report(job: dict) -> bytes:
+    """Render one report. job keys: data_file, profile_file, profile, period,
+    fmt ("PNG"/"PDF"), dark_mode, as_of (ISO date)."""
+    as_of = datetime.date.fromisoformat(job["as_of"])
+    period_days = REPORT_PERIOD_DAYS[job["period"]]
+    start = as_of - datetime.timedelta(days=period_days - 1)
+    days = [(start + datetime.timedelta(days=i)).isoformat() for i in range(period_days)]
+
+    hot = core.load_history(job["data_file"])
+    period = core.load_history_range(job["data_file"], days[0], days[-1], hot=hot)
+    raw = core.read_profile_file(job["profile_file"])
+
+    streak, best_date, best_intake, completion_rate, total_days, total_litres = \
+        core.compute_alltime_stats(hot, core.read_archive_summaries(job["data_file"]))
+    days_logged, period_total, days_met, avg = \
+        core.compute_weekly_summary(period, days=period_days, today=as_of)
+    unlocked = set(raw["badges"].split("|")) if raw.get("badges") else set()
+    badges = [name for name, (earned, _) in core.compute_badges(hot, streak, unlocked).items()
+              if earned]
+    cosmetics = {key: raw.get(key) == "True" for key in core.COSMETIC_KEYS}
+
+    colors = REPORT_COLORS[bool(job["dark_mode"])]
+    img = Image.new("RGB", REPORT_SIZE, colors["page"])
+    d = ImageDraw.Draw(img)
+    title, body, small = report_font(40), report_font(22), report_font(16)
+
+    label = "Weekly" if job["period"] == "week" else "Monthly"
+    # the built-in font has no emoji or typographic dashes, so keep text ASCII
+    d.text((40, 36), f"WaterBuddy - {label} report", fill=colors["text"], font=title)
+    d.text((40, 92), f"Profile: {job['profile']}   |   {days[0]} to {days[-1]}",
+           fill=colors["muted"], font=body)
+
+    draw_intake_chart(d, (40, 150, 860, 470), days, period, colors)
+
+    last_intake, last_goal = period.get(days[-1], (0, 1))
+    mascot = core.render_turtle(last_intake / max(1, last_goal) * 100,
+                               bool(job["dark_mode"]), cosmetics, rng=random.Random(0))
+    img.paste(mascot, (560, 520), mascot)
+
+    lines = [
+        f"Days logged: {days_logged} of {period_days}",
+        f"Total: {period_total} ml  |  average {avg:.0f} ml/day",
+        f"Goal met on {days_met} day(s)",
+        "",
+        f"Current streak: {streak} day(s)",
+        f"All-time days goal met: {completion_rate:.1f} % of {total_days}",
+        f"All-time total: {total_litres:.2f} L",
+    ]
+    if best_date:
+        lines.append(f"Best day: {best_date} with {best_intake} ml")
+    y = 520
+    for line in lines:
+        d.text((40, y), line, fill=colors["text"], font=body)
+        y += 34
+
+    d.text((40, y + 20), "Badges", fill=colors["text"], font=body)
+    y += 60
+    for name in badges or ["No badges yet - keep sipping!"]:
+        d.text((60, y), f"- {name}", fill=colors["text"], font=small)
+        y += 26
+
+    d.text((40, REPORT_SIZE[1] - 40),
+           f"Generated {datetime.datetime.now():%Y-%m-%d %H:%M} from {os.path.basename(job['data_file'])}",
+           fill=colors["muted"], font=small)
+
+    buf = io.BytesIO()
+    img.save(buf, format=job["fmt"])
+    return buf.getvalue()
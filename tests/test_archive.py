@@ -0,0 +1,87 @@
+import datetime
+import random
+
+import pytest
+
+import core
+
+
+def make_history(start: datetime.date, days: int, seed: int = 0, skip_every: int = 0) -> dict:
+    rng = random.Random(seed)
+    history = {}
+    for i in range(days):
+        if skip_every and i % skip_every == skip_every - 1:
+            continue
+        day = (start + datetime.timedelta(days=i)).isoformat()
+        goal = rng.choice((1800, 2000, 2200))
+        history[day] = (rng.randint(goal - 400, goal + 800), goal)
+    return history
+
+
+def write_log(path, history: dict):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("".join(f"{d},{t},{g}\n" for d, (t, g) in sorted(history.items())))
+
+
+def assert_same_stats(actual, expected):
+    # litres are summed per segment, so only float rounding may differ
+    assert actual[:5] == expected[:5]
+    assert actual[5] == pytest.approx(expected[5])
+
+
+def test_segment_round_trip(tmp_path):
+    rows = make_history(datetime.date(2022, 1, 1), 365, seed=1)
+    path = str(tmp_path / "water_log_me.2022.wba")
+
+    core.write_archive_segment(path, rows)
+
+    assert core.read_archive_rows(path) == rows
+    assert core.read_archive_summary(path) == core.segment_summary(rows)
+
+
+def test_retention_keeps_the_full_history(tmp_path):
+    data_file = str(tmp_path / "water_log_me.txt")
+    history = make_history(datetime.date(2021, 3, 1), 1100, seed=2, skip_every=17)
+    write_log(data_file, history)
+
+    years = core.apply_retention(data_file, datetime.date(2024, 3, 15))
+
+    assert years == [2021, 2022, 2023]
+    hot = core.load_history(data_file)
+    assert min(hot) >= "2024-01-01"
+    assert core.load_history_range(data_file) == history
+    assert core.load_history_range(data_file, "2022-06-01", "2023-02-01") == {
+        d: row for d, row in history.items() if "2022-06-01" <= d <= "2023-02-01"
+    }
+
+
+def test_alltime_stats_match_full_history(tmp_path):
+    for seed in range(5):
+        data_file = str(tmp_path / f"water_log_p{seed}.txt")
+        history = make_history(datetime.date(2021, 6, 1), 1000, seed=seed, skip_every=29)
+        write_log(data_file, history)
+        core.apply_retention(data_file, datetime.date(2024, 3, 1))
+
+        hot = core.load_history(data_file)
+        summaries = core.read_archive_summaries(data_file)
+        assert summaries
+        assert_same_stats(core.compute_alltime_stats(hot, summaries),
+                          core.compute_history_stats(history))
+
+
+def test_streak_crosses_archived_year_boundaries(tmp_path):
+    data_file = str(tmp_path / "water_log_me.txt")
+    start = datetime.date(2022, 10, 1)
+    # every day met from 2022-10-01 on, so the streak spans two archived years
+    history = {
+        (start + datetime.timedelta(days=i)).isoformat(): (2500, 2000) for i in range(600)
+    }
+    history["2022-09-30"] = (100, 2000)
+    write_log(data_file, history)
+
+    assert core.apply_retention(data_file, datetime.date(2024, 5, 23)) == [2022, 2023]
+
+    hot = core.load_history(data_file)
+    stats = core.compute_alltime_stats(hot, core.read_archive_summaries(data_file))
+    assert_same_stats(stats, core.compute_history_stats(history))
+    assert stats[0] == 600
@@ -0,0 +1,65 @@
+import app
+import core
+
+
+def write_as(service, path, content, origin):
+    core.write_file_atomic(
+        path, content, lambda version: service.expect_write(path, version, {origin})
+    )
+
+
+def test_each_session_sees_the_other_writers(tmp_path):
+    service = app.FileWatchService(poll_s=0.05)
+    path = str(tmp_path / "water_log_me.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("")
+    service.watch(path)
+    seen_a = {path: service.version(path)}
+    seen_b = dict(seen_a)
+
+    write_as(service, path, "a\n", "A")
+    write_as(service, path, "bb\n", "B")
+    # the rename notification arrives after the version was registered
+    service.check(path)
+
+    assert service.changes([path], seen_a, "A") == [path]
+    assert service.changes([path], seen_b, "B") == [path]
+
+
+def test_own_write_is_not_foreign(tmp_path):
+    service = app.FileWatchService(poll_s=0.05)
+    path = str(tmp_path / "water_profile_me.txt")
+    service.watch(path)
+    seen = {path: service.version(path)}
+
+    write_as(service, path, "xp=10\n", "A")
+    service.check(path)
+    assert service.changes([path], seen, "A") == []
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("xp=20\n")
+    service.check(path)
+    assert service.changes([path], seen, "A") == [path]
+
+
+def test_batch_is_tagged_with_every_writer(tmp_path):
+    service = app.FileWatchService(poll_s=0.05)
+    worker = app.PersistenceWorker(watcher=service)
+    path = str(tmp_path / "water_log_me.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("2023-03-01,500,2000\n")
+    service.watch(path)
+    seen_a = {path: service.version(path)}
+    seen_b = dict(seen_a)
+
+    # B's drink and A's retention pass land in the same batch
+    worker._write_batch([
+        ("log", path, ("2025-06-01", None, 250, 2000), "B"),
+        ("retention", path, "2025-06-01", "A"),
+    ])
+    service.check(path)
+
+    assert service.changes([path], seen_a, "A") == [path]
+    assert service.changes([path], seen_b, "B") == [path]
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == "2025-06-01,250,2000\n"
@@ -0,0 +1,55 @@
+import datetime
+import random
+
+import app
+
+
+def make_history(days=120, seed=3):
+    rng = random.Random(seed)
+    start = datetime.date(2024, 12, 1)
+    history = {}
+    for i in range(days):
+        if rng.random() < 0.2:
+            continue
+        day = (start + datetime.timedelta(days=i)).isoformat()
+        # few distinct values, so the value sorts have plenty of ties
+        history[day] = (rng.choice([0, 500, 1500, 2000]), rng.choice([2000, 2500]))
+    return history
+
+
+def reference_page(history, start, end, sort, descending, offset, limit):
+    rows = [(day, *history[day]) for day in sorted(history)
+            if (not start or day >= start) and (not end or day <= end)]
+    if sort != "date":
+        column = 1 if sort == "intake_ml" else 2
+        # stable, so ties keep date order before the whole list is reversed
+        rows = sorted(rows, key=lambda row: row[column])
+    if descending:
+        rows = rows[::-1]
+    return rows[offset:offset + limit], len(rows)
+
+
+def test_page_matches_reference():
+    history = make_history()
+    index = app.HistoryIndex(history)
+    dates = sorted(history)
+    filters = [(None, None), (dates[10], dates[60]), ("2025-01-01", None),
+               (None, "2024-12-15"), ("2030-01-01", None)]
+    for start, end in filters:
+        for sort in ("date", "intake_ml", "goal_ml"):
+            for descending in (True, False):
+                for offset, limit in ((0, 25), (20, 25), (90, 25), (0, 1000)):
+                    page, count = index.page(start, end, sort, descending, offset, limit)
+                    expected, expected_count = reference_page(
+                        history, start, end, sort, descending, offset, limit)
+                    got = list(zip(page["date"].dt.strftime("%Y-%m-%d"),
+                                   page["intake_ml"].tolist(), page["goal_ml"].tolist()))
+                    assert count == expected_count
+                    assert got == expected, (start, end, sort, descending, offset, limit)
+
+
+def test_page_empty_history():
+    page, count = app.HistoryIndex({}).page()
+    assert count == 0
+    assert page.empty
+    assert list(page.columns) == list(app.HistoryIndex.COLUMNS)
@@ -0,0 +1,111 @@
+import time
+
+import app
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_flush_reaches_watermark(tmp_path):
+    worker = app.PersistenceWorker()
+    data_file = str(tmp_path / "water_log_me.txt")
+    profile_file = str(tmp_path / "water_profile_me.txt")
+
+    worker.put_log_row(data_file, "2024-05-01", 250, 2000)
+    worker.put_log_row(data_file, "2024-05-01", 500, 2000)
+    seq = worker.put_file(profile_file, "xp=50\n")
+
+    assert worker.flush(timeout=5)
+    assert worker.last_persisted == seq
+    assert worker.pending == 0
+    assert not worker.has_pending(data_file)
+    with open(data_file, encoding="utf-8") as f:
+        assert f.read() == "2024-05-01,500,2000\n"
+
+
+def test_failed_write_holds_watermark_until_retried(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "PERSIST_RETRY_S", 0.05)
+    worker = app.PersistenceWorker()
+    missing_dir = tmp_path / "missing"
+    bad = str(missing_dir / "water_profile_a.txt")
+    good = str(tmp_path / "water_profile_b.txt")
+
+    bad_seq = worker.put_file(bad, "xp=1\n")
+    good_seq = worker.put_file(good, "xp=2\n")
+
+    assert not worker.flush(timeout=5)
+    assert worker.last_persisted == bad_seq - 1
+    assert worker.failing(bad)
+    assert worker.has_pending(bad)
+    assert worker.last_error is not None
+    # the other file in the batch was still written
+    assert not worker.has_pending(good)
+    with open(good, encoding="utf-8") as f:
+        assert f.read() == "xp=2\n"
+
+    missing_dir.mkdir()
+    assert wait_until(lambda: worker.last_persisted >= good_seq)
+    assert not worker.failing(bad)
+    assert worker.flush(timeout=5)
+    with open(bad, encoding="utf-8") as f:
+        assert f.read() == "xp=1\n"
+
+
+def test_drain_skips_only_failing_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "PERSIST_RETRY_S", 0.05)
+    worker = app.PersistenceWorker()
+    bad = str(tmp_path / "missing" / "water_profile_a.txt")
+    good = str(tmp_path / "water_profile_b.txt")
+
+    worker.put_file(bad, "xp=1\n")
+    assert wait_until(lambda: worker.failing(bad))
+    worker.put_file(good, "xp=2\n")
+
+    assert worker.drain(timeout=5)
+    assert worker.has_pending(bad)
+    with open(good, encoding="utf-8") as f:
+        assert f.read() == "xp=2\n"
+
+
+def test_pending_writes_are_tracked_per_origin(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "PERSIST_RETRY_S", 0.05)
+    worker = app.PersistenceWorker()
+    bad = str(tmp_path / "missing" / "water_profile_a.txt")
+
+    worker.put_file(bad, "xp=1\n", origin="A")
+    assert wait_until(lambda: worker.failing(bad))
+
+    assert worker.has_pending(bad)
+    assert worker.has_pending(bad, "A")
+    assert not worker.has_pending(bad, "B")
+    assert not worker.flush(timeout=0.2, paths=(bad,))
+
+
+def test_concurrent_drinks_add_up(tmp_path):
+    worker = app.PersistenceWorker()
+    data_file = str(tmp_path / "water_log_me.txt")
+    with open(data_file, "w", encoding="utf-8") as f:
+        f.write("2024-05-01,300,2000\n")
+
+    # two sessions that each loaded 300 ml log a drink
+    worker.put_log_add(data_file, "2024-05-01", 250, 2000, origin="A")
+    worker.put_log_add(data_file, "2024-05-01", 100, 2500, origin="B")
+    assert worker.flush(timeout=5)
+    worker.put_log_add(data_file, "2024-05-02", 400, 2500, origin="A")
+    assert worker.flush(timeout=5)
+    with open(data_file, encoding="utf-8") as f:
+        assert f.read() == "2024-05-01,650,2500\n2024-05-02,400,2500\n"
+
+    # a reset sets the total; a drink queued after it adds to that
+    worker._write_batch([
+        ("log", data_file, ("2024-05-02", 0, 0, 2500), "A"),
+        ("log", data_file, ("2024-05-02", None, 150, 2500), "B"),
+    ])
+    with open(data_file, encoding="utf-8") as f:
+        assert f.read() == "2024-05-01,650,2500\n2024-05-02,150,2500\n"
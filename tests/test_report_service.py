@@ -0,0 +1,9 @@
+import app
+
+
+def test_result_of_unknown_or_evicted_job_is_none():
+    service = app.ReportService(max_workers=1, max_entries=1)
+    key = ("me", "week", "PDF", False, "2024-05-01", (None, None))
+
+    assert service.status(key) == "missing"
+    assert service.result(key) is None
@@ -0,0 +1,40 @@
+import datetime
+import random
+
+import pytest
+
+import app
+import core
+
+
+def reference(history: dict, goal: int):
+    """compute_history_stats with every day's goal replaced by `goal`."""
+    streak, _, _, completion_rate, _, _ = core.compute_history_stats(
+        {d: (intake, goal) for d, (intake, _) in history.items()}
+    )
+    return completion_rate, streak
+
+
+def test_simulate_goals_matches_reference():
+    rng = random.Random(7)
+    start = datetime.date(2023, 1, 1)
+    history = {}
+    for i in range(400):
+        if rng.random() < 0.05:
+            continue  # gaps break the streak
+        history[(start + datetime.timedelta(days=i)).isoformat()] = (rng.randint(800, 3500), 2000)
+
+    goals = app.whatif_candidate_goals([1, 2750, 99999])
+    sim = app.simulate_goals(history, goals).set_index("goal_ml")
+
+    assert list(sim.index) == goals
+    for goal in goals:
+        completion_rate, streak = reference(history, goal)
+        assert sim.at[goal, "completion_rate"] == pytest.approx(completion_rate)
+        assert sim.at[goal, "streak"] == streak
+
+
+def test_simulate_goals_empty_history():
+    sim = app.simulate_goals({}, [2000])
+    assert sim["completion_rate"].tolist() == [0.0]
+    assert sim["streak"].tolist() == [0]